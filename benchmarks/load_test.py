@@ -0,0 +1,255 @@
+"""
+End-to-end load test of the routes in routers/hotels.py.
+
+Drives the running service at a fixed concurrency and cache-hit mix and reports p50/p95/p99 latency and
+requests per second per route. Results are saved as JSON under benchmarks/results, so runs can be compared.
+Run it against the upstream simulator to keep RapidAPI quota untouched.
+
+Usage:
+    python -m benchmarks.load_test --concurrency 50 --duration 60 --hit-ratio 0.9 --name baseline
+    python -m benchmarks.load_test --concurrency 50 --duration 60 --compare benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+API_PREFIX = "/api/v1/data"
+HOT_HOTEL_IDS = [4469654, 2534439, 46748, 176457, 1377073, 3157806, 2081946, 1956486, 1202179, 5278712]
+COLD_HOTEL_ID_START = 10000000  # Ids from here on are never repeated, so every request misses the cache
+LOCALE = "en-gb"
+CHECKIN_DATE = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+CHECKOUT_DATE = (datetime.now() + timedelta(days=31)).strftime('%Y-%m-%d')
+
+
+def hotel_route(hotel_ids):
+    return "/hotel", {"hotel_id": hotel_ids[0], "locale": LOCALE}
+
+
+def hotels_route(hotel_ids):
+    return "/hotels/", {"hotel_ids": hotel_ids, "locale": LOCALE}
+
+
+def photos_route(hotel_ids):
+    return "/photos", {"hotel_id": hotel_ids[0], "locale": LOCALE}
+
+
+def reviews_route(hotel_ids):
+    return "/reviews", {"hotel_id": hotel_ids[0], "locale": LOCALE}
+
+
+def reviews_aggregate_route(hotel_ids):
+    return "/reviews-aggregate", {"hotel_id": hotel_ids[0], "locale": LOCALE, "pages": 3}
+
+
+def room_list_route(hotel_ids):
+    return "/room-list", {"hotel_id": hotel_ids[0], "locale": LOCALE, "checkin_date": CHECKIN_DATE,
+                          "checkout_date": CHECKOUT_DATE}
+
+
+def room_min_price_list_route(hotel_ids):
+    return "/room-min-price-list", {"hotel_ids": hotel_ids, "locale": LOCALE, "checkin_date": CHECKIN_DATE,
+                                    "checkout_date": CHECKOUT_DATE}
+
+
+def detailed_hotel_route(hotel_ids):
+    return "/detailed_hotel", {"hotel_ids": hotel_ids, "show_rooms": "true"}
+
+
+ROUTES = {
+    "hotel": hotel_route,
+    "hotels": hotels_route,
+    "photos": photos_route,
+    "reviews": reviews_route,
+    "reviews-aggregate": reviews_aggregate_route,
+    "room-list": room_list_route,
+    "room-min-price-list": room_min_price_list_route,
+    "detailed_hotel": detailed_hotel_route,
+}
+
+
+def percentile(sorted_values, fraction):
+    """
+    Return the nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, status_codes, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies) + errors
+    return {
+        "requests": count,
+        "errors": errors + sum(number for status, number in status_codes.items() if int(status) >= 400),
+        "status_codes": {str(status): number for status, number in sorted(status_codes.items())},
+        "rps": count / elapsed if elapsed else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+class LoadTest:
+    """
+    Runs workers that each pick a route and a hot or cold set of hotel ids per request until the duration ends.
+    """
+
+    def __init__(self, base_url, token, routes, concurrency, duration, hit_ratio, hotels_per_request, seed=None):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.routes = routes
+        self.concurrency = concurrency
+        self.duration = duration
+        self.hit_ratio = hit_ratio
+        self.hotels_per_request = hotels_per_request
+        self.random = random.Random(seed)
+        self.next_cold_id = COLD_HOTEL_ID_START + self.random.randint(0, 10 ** 6) * 1000
+        self.latencies = {route: [] for route in routes}
+        self.status_codes = {route: Counter() for route in routes}
+        self.errors = Counter()
+
+    def pick_hotel_ids(self):
+        if self.random.random() < self.hit_ratio:
+            return self.random.sample(HOT_HOTEL_IDS, self.hotels_per_request)
+        hotel_ids = list(range(self.next_cold_id, self.next_cold_id + self.hotels_per_request))
+        self.next_cold_id += self.hotels_per_request
+        return hotel_ids
+
+    async def warm_up(self, client):
+        """
+        Request every route once with every hot id, so the hit ratio is not skewed by first-time misses.
+        """
+        for route in self.routes:
+            for start in range(0, len(HOT_HOTEL_IDS), self.hotels_per_request):
+                path, params = ROUTES[route](HOT_HOTEL_IDS[start:start + self.hotels_per_request])
+                try:
+                    await client.get(API_PREFIX + path, params=params)
+                except httpx.HTTPError:
+                    pass
+
+    async def worker(self, client, deadline):
+        while time.perf_counter() < deadline:
+            route = self.random.choice(self.routes)
+            path, params = ROUTES[route](self.pick_hotel_ids())
+            start_time = time.perf_counter()
+            try:
+                response = await client.get(API_PREFIX + path, params=params)
+                self.latencies[route].append((time.perf_counter() - start_time) * 1000)
+                self.status_codes[route][response.status_code] += 1
+            except httpx.HTTPError:
+                self.errors[route] += 1
+
+    async def run(self, warm_up=True):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, headers={"Authorization": f"Bearer {self.token}"},
+                                     limits=limits, timeout=120) as client:
+            if warm_up:
+                await self.warm_up(client)
+            start_time = time.perf_counter()
+            deadline = start_time + self.duration
+            await asyncio.gather(*(self.worker(client, deadline) for _ in range(self.concurrency)))
+            elapsed = time.perf_counter() - start_time
+
+        all_status_codes = Counter()
+        for counter in self.status_codes.values():
+            all_status_codes.update(counter)
+        return {
+            "routes": {route: summarize(self.latencies[route], self.status_codes[route], self.errors[route], elapsed)
+                       for route in self.routes},
+            "overall": summarize([latency for values in self.latencies.values() for latency in values],
+                                 all_status_codes, sum(self.errors.values()), elapsed),
+            "elapsed_seconds": elapsed,
+        }
+
+
+def print_report(result, baseline=None):
+    header = f"{'route':<22}{'requests':>10}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    rows = list(result["routes"].items()) + [("overall", result["overall"])]
+    for route, summary in rows:
+        print(f"{route:<22}{summary['requests']:>10}{summary['errors']:>8}{summary['rps']:>9.1f}"
+              f"{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}")
+        if baseline is None:
+            continue
+        previous = baseline["overall"] if route == "overall" else baseline["routes"].get(route)
+        if previous:
+            print(f"{'  vs ' + baseline['name']:<22}{'':>10}{'':>8}"
+                  + "".join(f"{change(summary[metric], previous[metric]):>{width}}"
+                            for metric, width in (("rps", 9), ("p50_ms", 10), ("p95_ms", 10), ("p99_ms", 10))))
+
+
+def change(current, previous):
+    if not previous:
+        return "n/a"
+    return f"{(current - previous) / previous * 100:+.1f}%"
+
+
+def save_result(result, name):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=2)
+    return path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the hotel routes and report latency percentiles.")
+    parser.add_argument("--base-url", default="http://localhost:8088")
+    parser.add_argument("--token", default=os.getenv("BEARER_SECRET_KEY"), help="Default: BEARER_SECRET_KEY.")
+    parser.add_argument("--routes", default=",".join(ROUTES),
+                        help=f"Comma separated routes. Default: {','.join(ROUTES)}.")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients. Default: 20.")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run. Default: 30.")
+    parser.add_argument("--hit-ratio", type=float, default=0.9,
+                        help="Share of requests for hot hotel ids, the rest use ids never requested before.")
+    parser.add_argument("--hotels-per-request", type=int, default=2, help="Hotel ids of the multi-hotel routes.")
+    parser.add_argument("--no-warm-up", action="store_true", help="Skip requesting the hot ids before the run.")
+    parser.add_argument("--name", default=None, help="Result file name. Default: a UTC timestamp.")
+    parser.add_argument("--compare", default=None, help="Result file to compare against.")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    routes = [route for route in args.routes.split(",") if route]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        raise SystemExit(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+    name = args.name or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    load_test = LoadTest(args.base_url, args.token, routes, args.concurrency, args.duration, args.hit_ratio,
+                         args.hotels_per_request, args.seed)
+    result = await load_test.run(warm_up=not args.no_warm_up)
+    result.update({
+        "name": name,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("token", "compare", "name")},
+    })
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_report(result, baseline)
+    print(f"Saved results to {save_result(result, name)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
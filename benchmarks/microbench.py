@@ -0,0 +1,338 @@
+"""
+Microbenchmarks of the transform and validation hot paths.
+
+Each case runs over the bundled static/ fixtures and over synthetic inputs scaled up to the given sizes
+(room blocks, facility ids, description translations, photos, reviews or model instances). Models are scaled
+by a field they validate, or by their number of instances. Time per call and peak allocations are
+reported, and a run can be saved as a baseline and checked against it to catch regressions.
+
+Usage:
+    python -m benchmarks.microbench --save benchmarks/results/microbench-baseline.json
+    python -m benchmarks.microbench --baseline benchmarks/results/microbench-baseline.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Optional
+
+from components.custom_logger import get_logger
+from components.facilities import facilities, map_facility_ids
+from components.transform_data import extract_hotel_data, transform_data, transform_room_data
+from benchmarks.upstream_simulator import build_reviews
+from db.cache_payload import encode_payload
+from models.detailed_hotel import DetailedHotelResponse
+from models.hotels import Hotel
+from models.photos import Photo, photos_adapter
+from models.reviews import Review, reviews_adapter
+from models.rooms import RoomsData, rooms_data_adapter
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEAT = 5
+MIN_RUN_SECONDS = 0.2  # Calls per repeat are raised until a repeat takes at least this long
+FIXTURE = "fixture"
+
+
+def load_fixture(name):
+    with open(os.path.join(STATIC_DIR, name), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+HOTEL = load_fixture("hotel_data.json")
+ROOMS = load_fixture("room.json")
+DETAILED_HOTEL = load_fixture("response_1726394890655.json")
+FACILITY_IDS = [facility["facility_type_id"] for facility in facilities if facility.get("facility_type_id")]
+
+
+def run_coroutine(coroutine):
+    """
+    Run a coroutine that never suspends without an event loop, so loop overhead does not skew the timings.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    # The coroutine suspended, so finish it on a real loop
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def scaled_rooms(size):
+    """
+    Return the room.json fixture with its blocks repeated to `size` blocks. Blocks are shared, not copied,
+    so only the benchmarked code allocates.
+    """
+    if size == FIXTURE:
+        return ROOMS
+    blocks = ROOMS[0]["block"]
+    return [{**ROOMS[0], "block": [blocks[index % len(blocks)] for index in range(size)]}]
+
+
+def scaled_room_list(size):
+    """
+    Return a room list of `size` items for the RoomsData cases. RoomsData passes its Any fields (block, rooms
+    and the policies) through unvalidated, so the items only carry the fields it validates.
+    """
+    if size == FIXTURE:
+        return ROOMS
+    fields = RoomsData.model_fields
+    item = {name: value for name, value in ROOMS[0].items()
+            if name in fields and fields[name].annotation not in (Any, Optional[Any])}
+    return [item] * size
+
+
+def scaled_facility_ids(size):
+    if size == FIXTURE:
+        return [int(value) for value in HOTEL.get("hotel_facilities", "").split(",") if value]
+    return [FACILITY_IDS[index % len(FACILITY_IDS)] for index in range(size)]
+
+
+def scaled_hotel(size):
+    if size == FIXTURE:
+        return HOTEL
+    return {**HOTEL, "hotel_facilities": ",".join(map(str, scaled_facility_ids(size)))}
+
+
+def scaled_detailed_hotels(size):
+    """
+    Return `size` detailed hotels, one per hotel id of a /detailed_hotel request. The photos are an untyped
+    list, so the number of hotels is scaled rather than their photos.
+    """
+    return [DETAILED_HOTEL] * (1 if size == FIXTURE else size)
+
+
+def transform_data_case(size):
+    hotel = scaled_hotel(size)
+    return lambda: run_coroutine(transform_data(hotel))
+
+
+def transform_room_data_case(size):
+    rooms = scaled_rooms(size)
+    return lambda: run_coroutine(transform_room_data(rooms, disable_google_translations=True))
+
+
+def extract_hotel_data_case(size):
+    rooms = scaled_rooms(size)
+    return lambda: run_coroutine(extract_hotel_data(HOTEL, rooms))
+
+
+def map_facility_ids_case(size):
+    facility_ids = scaled_facility_ids(size)
+    return lambda: map_facility_ids(facility_ids, facilities, "en-gb")
+
+
+def rooms_data_model_case(size):
+    rooms = scaled_room_list(size)
+    return lambda: [RoomsData(**room) for room in rooms]
+
+
+def hotel_model_case(size):
+    hotel = HOTEL
+    if size != FIXTURE:
+        translations = HOTEL["description_translations"]
+        hotel = {**HOTEL, "description_translations": [translations[index % len(translations)]
+                                                       for index in range(size)]}
+    return lambda: Hotel(**hotel)
+
+
+def detailed_hotel_model_case(size):
+    detailed_hotels = scaled_detailed_hotels(size)
+    return lambda: [DetailedHotelResponse(**detailed_hotel) for detailed_hotel in detailed_hotels]
+
+
+def ingest_room_list_case(size):
+    """
+    Work done on a fresh upstream room list: decode the body once and encode the Redis value.
+    """
+    body = json.dumps(scaled_rooms(size), ensure_ascii=False).encode()
+
+    def ingest():
+        return json.loads(body), encode_payload(body)
+
+    return ingest
+
+
+def scaled_photos(size):
+    photos = DETAILED_HOTEL["items"]["hotel"]["photos"]
+    if size == FIXTURE:
+        return photos
+    return [photos[index % len(photos)] for index in range(size)]
+
+
+def scaled_reviews(size):
+    count = 25 if size == FIXTURE else size
+    return [review for page in range(0, count // 25 + 1) for review in build_reviews(4469654, page)["result"]][:count]
+
+
+def validate_dict_case(items, model):
+    """
+    Validation as the routers did it before TypeAdapters: decode the JSON, then build each model from a dict.
+    """
+    body = json.dumps(items, ensure_ascii=False).encode()
+    return lambda: [model(**item) for item in json.loads(body)]
+
+
+def validate_json_case(items, adapter):
+    """
+    Validation of the raw JSON bytes with a compiled TypeAdapter, without the intermediate dicts.
+    """
+    body = json.dumps(items, ensure_ascii=False).encode()
+    return lambda: adapter.validate_json(body)
+
+
+def log_info_case(size):
+    """
+    Cost of hot-path INFO logging on the calling thread, `size` records per call.
+    """
+    logger = get_logger("microbench")
+    count = 1 if size == FIXTURE else size
+    return lambda: [logger.info("Data fetched from API and queued for caching with key: %s", index)
+                    for index in range(count)]
+
+
+CASES = {
+    "transform_data": transform_data_case,
+    "transform_room_data": transform_room_data_case,
+    "extract_hotel_data": extract_hotel_data_case,
+    "map_facility_ids": map_facility_ids_case,
+    "RoomsData": rooms_data_model_case,
+    "Hotel": hotel_model_case,
+    "DetailedHotelResponse": detailed_hotel_model_case,
+    "ingest_room_list": ingest_room_list_case,
+    "RoomsData_dict": lambda size: validate_dict_case(scaled_room_list(size), RoomsData),
+    "RoomsData_json": lambda size: validate_json_case(scaled_room_list(size), rooms_data_adapter),
+    "Review_dict": lambda size: validate_dict_case(scaled_reviews(size), Review),
+    "Review_json": lambda size: validate_json_case(scaled_reviews(size), reviews_adapter),
+    "Photo_dict": lambda size: validate_dict_case(scaled_photos(size), Photo),
+    "Photo_json": lambda size: validate_json_case(scaled_photos(size), photos_adapter),
+    "log_info": log_info_case,
+}
+
+
+def measure_time(function, repeat):
+    """
+    Return the per-call times in milliseconds of `repeat` runs, each calling the function enough times to
+    take at least MIN_RUN_SECONDS.
+    """
+    number = 1
+    while True:
+        start_time = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= MIN_RUN_SECONDS:
+            break
+        number *= 10 if elapsed < MIN_RUN_SECONDS / 10 else 2
+
+    timings = [elapsed / number * 1000]
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat - 1):
+            start_time = time.perf_counter()
+            for _ in range(number):
+                function()
+            timings.append((time.perf_counter() - start_time) / number * 1000)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return timings
+
+
+def measure_peak_memory(function):
+    """
+    Return the peak bytes allocated during a single call.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_benchmarks(case_names, sizes, repeat):
+    results = {}
+    for name in case_names:
+        for size in [FIXTURE] + sizes:
+            function = CASES[name](size)
+            timings = measure_time(function, repeat)
+            result = {
+                "median_ms": statistics.median(timings),
+                "min_ms": min(timings),
+                "peak_kb": measure_peak_memory(function) / 1024,
+            }
+            results[f"{name}[{size}]"] = result
+            print(f"{name + '[' + str(size) + ']':<36}{result['median_ms']:>12.3f}{result['min_ms']:>12.3f}"
+                  f"{result['peak_kb']:>14.1f}")
+    return results
+
+
+def find_regressions(results, baseline, tolerance, memory_tolerance):
+    """
+    Return a message for every case slower or larger than its baseline by more than the tolerances.
+    """
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if result["min_ms"] > previous["min_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: {previous['min_ms']:.3f} ms -> {result['min_ms']:.3f} ms")
+        if result["peak_kb"] > previous["peak_kb"] * (1 + memory_tolerance):
+            regressions.append(f"{key}: {previous['peak_kb']:.1f} KB -> {result['peak_kb']:.1f} KB peak")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the transform and validation hot paths.")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma separated cases. Default: all.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma separated synthetic input sizes. Default: 1000,10000,100000.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per case. Default: 5.")
+    parser.add_argument("--save", default=None, help="Write the results to this baseline file.")
+    parser.add_argument("--baseline", default=None, help="Fail when a case regressed against this file.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown. Default: 0.25 (25%%).")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10,
+                        help="Allowed peak memory growth. Default: 0.10 (10%%).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    case_names = [name for name in args.cases.split(",") if name]
+    unknown = set(case_names) - set(CASES)
+    if unknown:
+        raise SystemExit(f"Unknown cases: {', '.join(sorted(unknown))}")
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    print(f"{'case':<36}{'median ms':>12}{'min ms':>12}{'peak KB':>14}")
+    results = run_benchmarks(case_names, sizes, args.repeat)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.tolerance, args.memory_tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
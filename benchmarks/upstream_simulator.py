@@ -0,0 +1,171 @@
+"""
+Local stand-in for the Booking.com RapidAPI upstream, serving the fixtures in static/.
+
+Latency, error rate and 429 behaviour are configurable, so the service can be load tested without spending
+RapidAPI quota. Point the app at it with RAPIDAPI_BASE_URL.
+
+Usage:
+    python -m benchmarks.upstream_simulator --port 9000 --latency-ms 150 --jitter-ms 50 --error-rate 0.02
+    RAPIDAPI_BASE_URL=http://localhost:9000 uvicorn main:app --port 8088
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import time
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+DETAILED_HOTEL_FIXTURE = "response_1726394890655.json"
+REVIEWS_PER_PAGE = 25
+TRAVEL_PURPOSES = ["leisure", "business"]
+CUSTOMER_TYPES = ["solo_traveller", "review_category_group_of_friends", "couple", "family_with_children"]
+REVIEW_LANGUAGES = ["en-us", "en-gb", "de", "fr", "it", "es"]
+
+
+def load_fixture(name):
+    with open(os.path.join(STATIC_DIR, name), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def build_reviews(hotel_id, page_number):
+    """
+    Build a deterministic page of reviews, since static/ has no reviews fixture.
+    """
+    generator = random.Random(hotel_id * 1000 + page_number)
+    reviews = []
+    for index in range(REVIEWS_PER_PAGE):
+        review_id = hotel_id * 100000 + page_number * REVIEWS_PER_PAGE + index
+        reviews.append({
+            "review_id": review_id,
+            "hotel_id": hotel_id,
+            "date": f"2024-{generator.randint(1, 12):02d}-{generator.randint(1, 28):02d} 10:00:00",
+            "languagecode": generator.choice(REVIEW_LANGUAGES),
+            "title": f"Review {review_id}",
+            "pros": "Great location and friendly staff.",
+            "cons": "Breakfast could be better.",
+            "travel_purpose": generator.choice(TRAVEL_PURPOSES),
+            "average_score": round(generator.uniform(4, 10), 1),
+            "author": {"name": f"Guest {index}", "type": generator.choice(CUSTOMER_TYPES), "nr_reviews": 1},
+            "helpful_vote_count": generator.randint(0, 20),
+            "tags": [],
+        })
+    return {"result": reviews, "count": REVIEWS_PER_PAGE, "sort_options": ["SORT_MOST_RELEVANT"]}
+
+
+class UpstreamSimulator:
+    """
+    Serves the fixtures and injects latency, errors and 429 responses.
+
+    The rate limit is a fixed one second window like RapidAPI's, answered with a Retry-After header.
+    """
+
+    def __init__(self, latency_ms=100.0, jitter_ms=0.0, error_rate=0.0, not_found_rate=0.0, rate_limit=0,
+                 retry_after=1, room_list_fixture="room.json", seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.hotel = load_fixture("hotel_data.json")
+        self.rooms = load_fixture(room_list_fixture)
+        self.photos = load_fixture(DETAILED_HOTEL_FIXTURE)["items"]["hotel"]["photos"]
+        self.window = 0
+        self.window_count = 0
+        self.status_counts = Counter()
+        self.endpoint_counts = Counter()
+
+    def is_rate_limited(self):
+        if not self.rate_limit:
+            return False
+        window = int(time.time())
+        if window != self.window:
+            self.window, self.window_count = window, 0
+        self.window_count += 1
+        return self.window_count > self.rate_limit
+
+    def build_payload(self, endpoint, params):
+        hotel_id = int(params.get("hotel_id", self.hotel["hotel_id"]))
+        if endpoint == "data":
+            return {**self.hotel, "hotel_id": hotel_id}
+        if endpoint == "room-list":
+            rooms = copy.copy(self.rooms)
+            rooms[0] = {**rooms[0], "hotel_id": hotel_id}
+            return rooms
+        if endpoint == "photos":
+            return self.photos
+        if endpoint == "reviews":
+            return build_reviews(hotel_id, int(params.get("page_number", 0)))
+        return None
+
+    async def handle(self, endpoint, params):
+        self.endpoint_counts[endpoint] += 1
+        delay = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+
+        if self.is_rate_limited():
+            response = JSONResponse({"message": "Too many requests"}, status_code=429,
+                                    headers={"Retry-After": str(self.retry_after)})
+        elif self.random.random() < self.error_rate:
+            response = JSONResponse({"message": "Internal server error"}, status_code=self.random.choice([500, 503]))
+        elif self.random.random() < self.not_found_rate:
+            response = JSONResponse({"message": "Hotel not found"}, status_code=404)
+        else:
+            payload = self.build_payload(endpoint, params)
+            response = JSONResponse(payload if payload is not None else {"message": "Unknown endpoint"},
+                                    status_code=200 if payload is not None else 404)
+
+        self.status_counts[response.status_code] += 1
+        return response
+
+    def stats(self):
+        return {"endpoints": dict(self.endpoint_counts), "status_codes": dict(self.status_counts)}
+
+
+def create_app(simulator: UpstreamSimulator):
+    app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+
+    @app.get("/api/v1/hotels/{endpoint}")
+    async def hotels(endpoint: str, request: Request):
+        return await simulator.handle(endpoint, request.query_params)
+
+    @app.get("/simulator/stats")
+    async def stats():
+        return simulator.stats()
+
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local Booking.com upstream simulator serving static/ fixtures.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=100, help="Mean response latency. Default: 100.")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform latency jitter, plus or minus.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500/503.")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="Share of requests answered with 404.")
+    parser.add_argument("--rate-limit", type=int, default=0,
+                        help="Requests per second before answering 429. Default: 0, unlimited.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds of 429 responses.")
+    parser.add_argument("--room-list-fixture", default="room.json", choices=["room.json", "sample_rooms.json"])
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible error injection.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    simulator = UpstreamSimulator(args.latency_ms, args.jitter_ms, args.error_rate, args.not_found_rate,
+                                  args.rate_limit, args.retry_after, args.room_list_fixture, args.seed)
+    uvicorn.run(create_app(simulator), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
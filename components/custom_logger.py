@@ -1,48 +1,181 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import MemoryHandler, RotatingFileHandler
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
+from dotenv import load_dotenv
 
-def get_logger(name: str, log_file: str = 'app.log', max_bytes: int = 10 * 1024 * 1024, backup_count: int = 10,
-               memory_capacity: int = 10000):
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # Records are dropped, not waited for, when it is full
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", 1.0))  # Share of INFO and DEBUG records kept
+LOG_INFO_RATE_LIMIT = float(os.getenv("LOG_INFO_RATE_LIMIT", 20))  # INFO records per second per message, 0 disables
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}  # Anything else came from extra=
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a single JSON line. The fields passed with extra= are added as top-level keys, so
+    structured data stays queryable instead of being nested as a string in the message.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class HotPathFilter(logging.Filter):
+    """
+    Samples and rate limits records below WARNING, so hot-path INFO lines cannot flood the log under load.
+    The rate limit applies per logger and message template, with a one second window.
+    """
+
+    def __init__(self, sample_rate: float = LOG_INFO_SAMPLE_RATE, rate_limit: float = LOG_INFO_RATE_LIMIT):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.windows = {}  # (logger, template) -> [window start, records in window]
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self.suppressed += 1
+            return False
+        if not self.rate_limit:
+            return True
+
+        now = time.monotonic()
+        window = self.windows.get((record.name, record.msg))
+        if window is None or now - window[0] >= 1:
+            if len(self.windows) > 10000:
+                self.windows.clear()
+            self.windows[(record.name, record.msg)] = [now, 1]
+            return True
+        window[1] += 1
+        if window[1] > self.rate_limit:
+            self.suppressed += 1
+            return False
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without formatting them and drops them when the queue is full, so
+    logging never blocks the event loop on disk I/O.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only merge the arguments and render the traceback here, the listener formats the line
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_pipeline = {}
+
+
+def _get_queue_handler(log_file, max_bytes, backup_count):
+    """
+    Create the process-wide queue handler and its listener thread on first use. Every logger shares them, so
+    each record is written once by a single file handler.
+    """
+    with _lock:
+        if "handler" in _pipeline:
+            return _pipeline["handler"]
+
+        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+        file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        handler = NonBlockingQueueHandler(log_queue)
+        hot_path_filter = HotPathFilter()
+        handler.addFilter(hot_path_filter)
+
+        listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+
+        _pipeline.update(handler=handler, filter=hot_path_filter, listener=listener, queue=log_queue)
+        return handler
+
+
+def logging_stats():
+    """
+    Return the number of records written, suppressed by sampling or rate limits, and dropped on a full queue.
+    """
+    if "handler" not in _pipeline:
+        return {}
+    return {
+        "enqueued_total": _pipeline["handler"].enqueued,
+        "suppressed_total": _pipeline["filter"].suppressed,
+        "dropped_total": _pipeline["handler"].dropped,
+        "queue_depth": _pipeline["queue"].qsize(),
+    }
+
+
+def get_logger(name: str, log_file: str = 'app.log', max_bytes: int = 10 * 1024 * 1024, backup_count: int = 10):
     """
     Sets up and returns a logger instance.
 
+    Records go through a queue to a listener thread that formats and writes them, so the caller only pays for
+    a queue put. INFO records are sampled and rate limited, see HotPathFilter.
+
     Args:
         name (str): The name of the logger.
-        log_file (str): Path to the log file.
+        log_file (str): Path to the log file, used by the first logger created in the process.
         max_bytes (int): Maximum size of the log file before rotation (default 10MB).
         backup_count (int): Number of backup files to keep (default 10).
-        memory_capacity (int): Maximum number of log entries to keep in memory (default 10,000).
 
     Returns:
         logging.Logger: Configured logger instance.
     """
-
-    # Set up the logger
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-
-    # Configure a RotatingFileHandler that keeps the last 10,000 log rows
-    log_file_handler = RotatingFileHandler(
-        log_file,  # The log file path
-        maxBytes=max_bytes,  # Maximum log file size (10MB by default)
-        backupCount=backup_count  # Number of backup log files to keep
-    )
-
-    # Set up the MemoryHandler to buffer logs and flush when full or upon critical events
-    memory_handler = MemoryHandler(
-        capacity=memory_capacity,  # Save only the last 10,000 log records in memory
-        flushLevel=logging.ERROR,  # Automatically flush on ERROR or higher level logs
-        target=log_file_handler  # Output to rotating file handler
-    )
-
-    # Formatter for the logs
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    log_file_handler.setFormatter(formatter)
-    memory_handler.setFormatter(formatter)
-
-    # Add handlers to the logger
-    logger.addHandler(memory_handler)
-    logger.addHandler(log_file_handler)
-
-    return logger
\ No newline at end of file
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+    # Calling get_logger again for the same name must not add a second handler
+    handler = _get_queue_handler(log_file, max_bytes, backup_count)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+
+    return logger
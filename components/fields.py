@@ -0,0 +1,115 @@
+"""
+Sparse fieldsets: the fields= query param that limits a response to the fields a client asks for.
+
+A selector is a comma separated list of dotted paths, e.g. 'block.min_price,hotel_id'. It is parsed into a
+tree of the selected fields, {'block': {'min_price': True}, 'hotel_id': True}, which is applied to the
+response data before serialization and pushed down into the storage lookup as a projection. Lists are
+projected item by item, the same way a MongoDB projection treats arrays.
+"""
+import hashlib
+import json
+import re
+from typing import Optional
+
+from fastapi import HTTPException
+
+MAX_FIELDS = 50  # Paths allowed in one selector
+MAX_VARIANT_LENGTH = 100  # Longer selectors are hashed in cache keys
+FIELD_PATH = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[dict]:
+    """
+    Parse a fields= selector into a tree of the selected fields.
+
+    When a path and one of its sub-paths are both given, e.g. 'block,block.min_price', the shorter path wins
+    and the whole field is returned.
+
+    Args:
+        fields (str): Comma separated dotted field paths, or None.
+
+    Returns:
+        dict: The field tree, or None when no fields are selected.
+
+    Raises:
+        HTTPException: 400 if a path is not a dotted list of field names.
+    """
+    if not fields:
+        return None
+    paths = [path.strip() for path in fields.split(",") if path.strip()]
+    if not paths:
+        return None
+    if len(paths) > MAX_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Too many fields, at most {MAX_FIELDS} are allowed")
+    for path in paths:
+        if not FIELD_PATH.match(path):
+            raise HTTPException(status_code=400, detail=f"Invalid field '{path}', expected dotted field names")
+
+    tree = {}
+    for path in paths:
+        *parents, name = path.split(".")
+        node = tree
+        for parent in parents:
+            if node.get(parent) is True:
+                break
+            node = node.setdefault(parent, {})
+        else:
+            node[name] = True
+    return tree
+
+
+def field_paths(tree, prefix=""):
+    """
+    Return the dotted paths of the selected fields of a tree, e.g. ['block.min_price', 'hotel_id'].
+    """
+    paths = []
+    for name, node in tree.items():
+        path = f"{prefix}{name}"
+        paths.extend([path] if node is True else field_paths(node, f"{path}."))
+    return paths
+
+
+def subtree(tree, path):
+    """
+    Return the part of a tree below a dotted path: True if the whole field is selected, a tree if only some
+    of its fields are, or None if it is not selected at all. A missing tree selects everything.
+    """
+    node = True if tree is None else tree
+    for name in path.split("."):
+        if node is True:
+            return True
+        node = node.get(name)
+        if node is None:
+            return None
+    return node
+
+
+def fields_variant(tree) -> str:
+    """
+    Return a short canonical form of a tree for cache keys. Equivalent selectors give the same variant.
+    """
+    variant = ",".join(sorted(field_paths(tree)))
+    if len(variant) > MAX_VARIANT_LENGTH:
+        variant = f"sha1:{hashlib.sha1(variant.encode('utf-8')).hexdigest()}"
+    return variant
+
+
+def project(data, tree):
+    """
+    Return data limited to the fields of a tree. Lists are projected item by item and the fields keep the
+    order they have in data.
+    """
+    if tree is True or tree is None:
+        return data
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {name: project(value, tree[name]) for name, value in data.items() if name in tree}
+    return data
+
+
+def dump_fields(data, tree) -> bytes:
+    """
+    Project JSON-compatible data and serialize it as a compact JSON response body.
+    """
+    return json.dumps(project(data, tree), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,194 @@
+"""
+HTTP caching of cached responses: ETag, Last-Modified and Cache-Control headers, 304 Not Modified answers to
+conditional requests, and Content-Encoding negotiation of pre-compressed bodies.
+
+The ETag is a hash of the rendered body and Last-Modified is the 'created_at' of the stored document, both
+kept next to the body in the response cache, so a conditional request is answered without the body. Bodies
+are compressed once when they are cached, see db/response_cache.py, and served in the encoding the client
+accepts.
+"""
+import gzip
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from dotenv import load_dotenv
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # Optional, without it responses are only stored gzip compressed
+    brotli = None
+
+load_dotenv()
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_SCOPE = os.getenv("HTTP_CACHE_SCOPE", "private")  # public lets shared caches such as a CDN store responses
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 3600))  # Upper limit of the Cache-Control max-age, in seconds
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))  # Bodies are compressed once per cache fill
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", 5))
+RESPONSE_ENCODINGS = ("br", "gzip") if brotli else ("gzip",)  # In order of preference
+VARIANT_ETAG_SUFFIX = re.compile(r'-(?:br|gzip)"$')
+
+
+def make_etag(body) -> str:
+    """
+    Return the strong ETag of a response body.
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def variant_etag(etag, encoding) -> str:
+    """
+    Return the ETag of a compressed variant of a body, e.g. "<hash>-gzip". Every representation needs its
+    own strong ETag.
+    """
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def accepted_encodings(headers) -> list:
+    """
+    Return the RESPONSE_ENCODINGS the Accept-Encoding header of a request allows, the preferred one first.
+
+    Args:
+        headers (Mapping): The request headers, or None.
+
+    Returns:
+        list: The encodings, empty when only the uncompressed body is accepted.
+    """
+    accept_encoding = headers.get("accept-encoding") if headers is not None else None
+    if not accept_encoding:
+        return []
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, *parameters = item.split(";")
+        weight = 1.0
+        for parameter in parameters:
+            key, _, value = parameter.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    def weight_of(encoding):
+        return weights.get(encoding, weights.get("*", 0.0))
+
+    # sorted() is stable, so equally weighted encodings keep the order of RESPONSE_ENCODINGS
+    return sorted((encoding for encoding in RESPONSE_ENCODINGS if weight_of(encoding) > 0), key=lambda e: -weight_of(e))
+
+
+def compress_body(body, encoding) -> bytes:
+    """
+    Compress a response body with one of the RESPONSE_ENCODINGS.
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if encoding == "br":
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+def combine_entries(body, entries) -> dict:
+    """
+    Return the response cache entry of a body assembled from several cached responses. Its ETag is derived
+    from theirs and it was last modified when the newest of them was.
+    """
+    created_at = [entry["created_at"] for entry in entries if entry.get("created_at")]
+    return {
+        "body": body,
+        "etag": make_etag(",".join(entry.get("etag") or "" for entry in entries)),
+        "created_at": max(created_at, key=parse_created_at) if created_at else None,
+    }
+
+
+def parse_created_at(created_at):
+    """
+    Return the 'created_at' of a stored document as an aware datetime, or None.
+    """
+    if not created_at:
+        return None
+    created = datetime.fromisoformat(created_at)
+    return created if created.tzinfo else created.replace(tzinfo=timezone.utc)
+
+
+def is_not_modified(headers, etag, created_at) -> bool:
+    """
+    Check the If-None-Match and If-Modified-Since headers of a request against a cached response. As in
+    RFC 9110, If-Modified-Since is ignored when If-None-Match is present.
+
+    Args:
+        headers (Mapping): The request headers.
+        etag (str): The ETag of the cached response.
+        created_at (str): The ISO formatted 'created_at' of the data of the response.
+
+    Returns:
+        bool: Whether the client already holds the response and can be answered with 304.
+    """
+    if not HTTP_CACHE_ENABLED or not etag:
+        return False
+
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        # The ETags of the compressed variants match as well
+        tags = [VARIANT_ETAG_SUFFIX.sub('"', tag.strip().removeprefix("W/")) for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = headers.get("if-modified-since")
+    modified = parse_created_at(created_at)
+    if if_modified_since and modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole seconds
+        return since.tzinfo is not None and modified.replace(microsecond=0) <= since
+    return False
+
+
+def cache_headers(etag, created_at, expire_hours) -> dict:
+    """
+    Return the ETag, Last-Modified and Cache-Control headers of a cached response. The max-age is the time
+    left until the data expires after expire_hours, limited to HTTP_CACHE_MAX_AGE.
+    """
+    if not HTTP_CACHE_ENABLED or not etag:
+        return {}
+    headers = {"ETag": etag}
+    modified = parse_created_at(created_at)
+    if modified:
+        headers["Last-Modified"] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+        remaining = modified + timedelta(hours=expire_hours) - datetime.now(timezone.utc)
+        max_age = max(0, min(HTTP_CACHE_MAX_AGE, int(remaining.total_seconds())))
+        headers["Cache-Control"] = f"{HTTP_CACHE_SCOPE}, max-age={max_age}"
+    return headers
+
+
+def cached_response(request_headers, entry, expire_hours) -> Response:
+    """
+    Return the JSON response of a response cache entry, or 304 Not Modified when the client holds it already.
+
+    Args:
+        request_headers (Mapping): The request headers.
+        entry (dict): The 'body', 'etag' and 'created_at' of the response, and the 'encoding' the body is
+            compressed with, if any, see db/response_cache.py.
+        expire_hours (float): The number of hours the data stays valid.
+
+    Returns:
+        Response: The response with its caching headers.
+    """
+    encoding = entry.get("encoding")
+    headers = cache_headers(entry.get("etag"), entry.get("created_at"), expire_hours)
+    if "ETag" in headers:
+        headers["ETag"] = variant_etag(headers["ETag"], encoding)
+    headers["Vary"] = "Accept-Encoding"
+    if is_not_modified(request_headers, entry.get("etag"), entry.get("created_at")):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(entry["body"], media_type="application/json", headers=headers)
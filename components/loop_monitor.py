@@ -0,0 +1,141 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from dotenv import load_dotenv
+
+from components.custom_logger import get_logger
+from components.metrics import increment, observe
+
+load_dotenv()
+
+logger = get_logger("loop_monitor")
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", 0.1))  # Seconds between lag probes
+SLOW_CALLBACK_MS = float(os.getenv("SLOW_CALLBACK_MS", 100))  # Stalls longer than this are reported
+LAG_SAMPLES = 600  # Recent lag probes kept for the percentiles
+SLOW_CALLBACKS_KEPT = 50
+STACK_DEPTH = 30  # Frames kept of a stalled stack
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag and reports the code and route that blocked the loop.
+
+    A probe coroutine sleeps LOOP_LAG_INTERVAL and records how late it wakes up. A watchdog thread checks
+    that the probe keeps running; when the loop is blocked for longer than SLOW_CALLBACK_MS it captures the
+    stack of the loop thread while it is still stuck, and the route is taken from the router frames on that
+    stack. This works with uvloop, where asyncio's own slow callback logging is unavailable.
+    """
+    _instance = None
+
+    def __init__(self):
+        self.task = None
+        self.watchdog = None
+        self.stopped = threading.Event()
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.lags = deque(maxlen=LAG_SAMPLES)
+        self.max_lag = 0.0
+        self.stall_stack = None
+        self.slow_callbacks = deque(maxlen=SLOW_CALLBACKS_KEPT)
+        self.slow_callbacks_total = 0
+        self.routes = {}  # (file, function) of an endpoint -> route path
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def start(self, routes=()):
+        """
+        Start the lag probe and the watchdog thread.
+
+        Args:
+            routes (iterable): The app routes, used to name the route of a stalled endpoint.
+        """
+        self.routes = {(route.endpoint.__code__.co_filename, route.endpoint.__code__.co_name): route.path
+                       for route in routes if hasattr(getattr(route, "endpoint", None), "__code__")}
+        if not LOOP_MONITOR_ENABLED or (self.task is not None and not self.task.done()):
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+        self.task = asyncio.create_task(self._probe())
+        self.watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.watchdog.start()
+
+    async def stop(self):
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def stats(self):
+        """
+        Return the recent event loop lag percentiles in milliseconds and the number of stalls.
+        """
+        lags = sorted(self.lags)
+        if not lags:
+            return {"slow_callbacks_total": self.slow_callbacks_total}
+        return {
+            "lag_p50_ms": lags[len(lags) // 2] * 1000,
+            "lag_p99_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000,
+            "lag_max_ms": self.max_lag * 1000,
+            "slow_callbacks_total": self.slow_callbacks_total,
+        }
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(0.0, loop.time() - expected)
+            self.last_beat = time.monotonic()
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            observe("event_loop_lag_seconds", lag)
+
+            if lag * 1000 >= SLOW_CALLBACK_MS:
+                self.report_stall(lag)
+            else:
+                self.stall_stack = None
+
+    def _watch(self):
+        threshold = LOOP_LAG_INTERVAL + SLOW_CALLBACK_MS / 1000
+        while not self.stopped.wait(SLOW_CALLBACK_MS / 2000):
+            beat = self.last_beat
+            if self.stall_stack is None and time.monotonic() - beat > threshold:
+                frame = sys._current_frames().get(self.loop_thread_id)
+                if frame is not None:
+                    self.stall_stack = traceback.extract_stack(frame)[-STACK_DEPTH:]
+
+    def find_route(self, stack):
+        for frame in stack:
+            path = self.routes.get((frame.filename, frame.name))
+            if path:
+                return path
+        return "unknown"
+
+    def report_stall(self, lag):
+        stack, self.stall_stack = self.stall_stack, None
+        stack = stack or []
+        route = self.find_route(stack)
+        self.slow_callbacks_total += 1
+        increment("slow_callbacks_total", route=route)
+
+        location = f"{stack[-1].filename}:{stack[-1].lineno} in {stack[-1].name}" if stack else "unknown"
+        self.slow_callbacks.append({
+            "time": time.time(),
+            "duration_ms": round(lag * 1000, 1),
+            "route": route,
+            "location": location,
+            "stack": [f"{frame.filename}:{frame.lineno} in {frame.name}" for frame in stack],
+        })
+        logger.warning("Event loop blocked for %.0f ms in route %s at %s", lag * 1000, route, location)
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+
+from components.custom_logger import get_logger
+
+load_dotenv()
+
+logger = get_logger("metrics")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))  # Seconds between flushes to Redis
+METRICS_COUNTERS_KEY = "metrics:counters"
+METRICS_WORKERS_KEY = "metrics:workers"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "cache_requests_total": ("counter", "Cache lookups by endpoint and the tier that answered them.", None),
+    "cache_tier_duration_seconds": ("histogram", "Time spent in each cache tier.", LATENCY_BUCKETS),
+    "upstream_requests_total": ("counter", "Upstream API attempts by endpoint and status code.", None),
+    "upstream_request_duration_seconds": ("histogram", "Upstream API attempt latency.", LATENCY_BUCKETS),
+    "upstream_in_flight": ("gauge", "Upstream API requests currently in flight.", None),
+    "rate_limit_wait_seconds": ("histogram", "Time spent waiting for a rate limiter slot.", LATENCY_BUCKETS),
+    "translation_requests_total": ("counter", "Translation calls by target language and outcome.", None),
+    "translation_duration_seconds": ("histogram", "Translation call latency.", LATENCY_BUCKETS),
+    "fanout_size": ("histogram", "Keys requested per batched cache lookup.", SIZE_BUCKETS),
+    "upstream_fanout_size": ("histogram", "Concurrent upstream fetches per batched cache lookup.", SIZE_BUCKETS),
+    "event_loop_lag_seconds": ("histogram", "How late the event loop lag probe woke up.", LATENCY_BUCKETS),
+    "slow_callbacks_total": ("counter", "Event loop stalls over SLOW_CALLBACK_MS by route.", None),
+    "offload_tasks_total": ("counter", "Payload processing tasks by task and mode (inline or process).", None),
+    "offload_duration_seconds": ("histogram", "Time to process a payload in the offload pool.", LATENCY_BUCKETS),
+}
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_series(name, labels):
+    """
+    Return the Prometheus series name of a metric and its labels, e.g. name{endpoint="data"}.
+    """
+    if not labels:
+        return name
+    formatted = ",".join(f'{key}="{escape_label_value(value)}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{formatted}}}"
+
+
+def base_name(series):
+    name = series.split("{", 1)[0]
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return name
+
+
+class MetricsRegistry:
+    """
+    Collects counters, histograms and gauges in memory and flushes them to Redis, so the /metrics endpoint of
+    any worker reports the totals of all workers.
+
+    Recording a value is a dict update. Counters and histogram buckets are added to one Redis hash with
+    HINCRBYFLOAT; gauges are per worker, stored under the worker's pid with a TTL and reported with a
+    'worker' label.
+    """
+    _instance = None
+
+    def __init__(self):
+        self.counters = {}  # series -> increment since the last flush
+        self.gauges = {}  # series -> current value
+        self.collectors = {}  # prefix -> callable returning a dict of gauge values
+        self.redis = None
+        self.task = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def increment(self, name, value=1, **labels):
+        series = format_series(name, labels)
+        self.counters[series] = self.counters.get(series, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        for bucket in buckets:
+            if value <= bucket:
+                self.increment(f"{name}_bucket", le=bucket, **labels)
+        self.increment(f"{name}_bucket", le="+Inf", **labels)
+        self.increment(f"{name}_sum", value, **labels)
+        self.increment(f"{name}_count", **labels)
+
+    def add_gauge(self, name, value, **labels):
+        series = format_series(name, labels)
+        self.gauges[series] = self.gauges.get(series, 0) + value
+
+    def add_collector(self, prefix, collector):
+        """
+        Report the numeric values of collector() as gauges named <prefix>_<key> on every flush, e.g. the
+        stats() of the cache writer.
+        """
+        self.collectors[prefix] = collector
+
+    def collect_gauges(self):
+        gauges = dict(self.gauges)
+        for prefix, collector in self.collectors.items():
+            try:
+                for key, value in collector().items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        gauges[f"{prefix}_{key}"] = value
+            except Exception as e:
+                logger.warning(f"Metrics collector {prefix} failed: {str(e)}")
+        return gauges
+
+    def start(self, redis: Redis):
+        self.redis = redis
+        if METRICS_ENABLED and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.redis is not None:
+            await self.flush(self.redis)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                await self.flush(self.redis)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Metrics flush failed: {str(e)}")
+
+    async def flush(self, redis: Redis):
+        """
+        Add the counters recorded since the last flush to Redis and publish this worker's gauges, in one pipeline.
+        """
+        counters, self.counters = self.counters, {}
+        gauges = self.collect_gauges()
+        worker = str(os.getpid())
+        gauges_key = f"metrics:gauges:{worker}"
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for series, value in counters.items():
+                pipe.hincrbyfloat(METRICS_COUNTERS_KEY, series, value)
+            pipe.delete(gauges_key)
+            if gauges:
+                pipe.hset(gauges_key, mapping=gauges)
+                pipe.expire(gauges_key, int(METRICS_FLUSH_INTERVAL * 3) + 1)
+            pipe.zadd(METRICS_WORKERS_KEY, {worker: time.time()})
+            await pipe.execute()
+
+    async def render(self, redis: Redis):
+        """
+        Return the metrics of all workers in the Prometheus text exposition format.
+        """
+        await self.flush(redis)
+
+        series_values = {series: float(value) for series, value in (await redis.hgetall(METRICS_COUNTERS_KEY)).items()}
+
+        # Workers that have not flushed for a while are gone, their gauge hashes have expired as well
+        await redis.zremrangebyscore(METRICS_WORKERS_KEY, 0, time.time() - METRICS_FLUSH_INTERVAL * 3)
+        for worker in await redis.zrange(METRICS_WORKERS_KEY, 0, -1):
+            for series, value in (await redis.hgetall(f"metrics:gauges:{worker}")).items():
+                name, _, labels = series.partition("{")
+                labels = f'worker="{worker}",{labels}' if labels else f'worker="{worker}"}}'
+                series_values[f"{name}{{{labels}"] = float(value)
+
+        grouped = {}
+        for series, value in series_values.items():
+            grouped.setdefault(base_name(series), []).append((series, value))
+
+        lines = []
+        for name in sorted(grouped):
+            metric_type, help_text, _ = METRICS.get(name, ("gauge", name.replace("_", " ").capitalize() + ".", None))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(f"{series} {value:g}" for series, value in sorted(grouped[name], key=bucket_order))
+        return "\n".join(lines) + "\n"
+
+
+def bucket_order(item):
+    """
+    Sort histogram buckets by their numeric upper bound, with +Inf last.
+    """
+    series = item[0]
+    if 'le="' not in series:
+        return series, 0.0
+    bound = series.split('le="', 1)[1].split('"', 1)[0]
+    return series.replace(f'le="{bound}"', ""), float("inf") if bound == "+Inf" else float(bound)
+
+
+def increment(name, value=1, **labels):
+    if METRICS_ENABLED:
+        MetricsRegistry.get_instance().increment(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if METRICS_ENABLED:
+        MetricsRegistry.get_instance().observe(name, value, **labels)
+
+
+def add_gauge(name, value, **labels):
+    if METRICS_ENABLED:
+        MetricsRegistry.get_instance().add_gauge(name, value, **labels)
@@ -0,0 +1,120 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+
+from components import room_tasks
+from components.custom_logger import get_logger
+from components.metrics import increment, observe
+from components.tracing import span
+
+load_dotenv()
+
+logger = get_logger("offload")
+OFFLOAD_ENABLED = os.getenv("OFFLOAD_ENABLED", "false").lower() == "true"
+OFFLOAD_MIN_BYTES = int(os.getenv("OFFLOAD_MIN_BYTES", 256 * 1024))  # Smaller payloads are processed inline
+OFFLOAD_WORKERS = int(os.getenv("OFFLOAD_WORKERS", 2))  # Worker processes per API worker
+
+
+class OffloadPool:
+    """
+    Process pool for CPU-heavy payload processing, so large room lists are decoded, validated and reduced
+    without blocking the event loop that serves other requests.
+
+    A payload goes to the pool when offloading is enabled and it is raw JSON text of at least
+    OFFLOAD_MIN_BYTES; only the text and the compact result cross the process boundary. Everything else is
+    processed inline, which is cheaper than the round-trip for small payloads.
+    """
+    _instance = None
+
+    def __init__(self, enabled: bool = OFFLOAD_ENABLED, min_bytes: int = OFFLOAD_MIN_BYTES,
+                 workers: int = OFFLOAD_WORKERS):
+        self.enabled = enabled and workers > 0
+        self.min_bytes = min_bytes
+        self.workers = workers
+        self.pool = None
+        self.in_flight = 0
+        self.offloaded_total = 0
+        self.inline_total = 0
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    async def start(self):
+        """
+        Create the pool and start its worker processes, so the first large request does not pay for it.
+        """
+        if not self.enabled or self.pool is not None:
+            return
+        # Spawned workers do not inherit the event loop, Redis connections or logging threads of this process
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, room_tasks.warm_up) for _ in range(self.workers)])
+        logger.info("Started %d offload worker processes", self.workers)
+
+    async def close(self):
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            await asyncio.to_thread(pool.shutdown)
+
+    def should_offload(self, raw):
+        return self.enabled and isinstance(raw, (str, bytes)) and len(raw) >= self.min_bytes
+
+    async def run(self, function, raw, *args):
+        """
+        Run function(raw, *args) in the pool if the payload is large enough, inline otherwise.
+
+        Args:
+            function (callable): A module-level function of components.room_tasks.
+            raw (str | bytes | Any): The raw JSON text, or data that is already decoded.
+            *args: Further picklable arguments of the function.
+
+        Returns:
+            The result of the function.
+        """
+        if not self.should_offload(raw):
+            self.inline_total += 1
+            increment("offload_tasks_total", task=function.__name__, mode="inline")
+            with span("validate", task=function.__name__):
+                return function(raw, *args)
+
+        if self.pool is None:
+            await self.start()
+        self.offloaded_total += 1
+        self.in_flight += 1
+        start_time = time.perf_counter()
+        try:
+            with span("offload", task=function.__name__, size=len(raw)):
+                return await asyncio.get_running_loop().run_in_executor(self.pool, function, raw, *args)
+        except BrokenProcessPool:
+            # A worker died, e.g. killed for memory; process this payload inline and start a new pool next time
+            logger.error("Offload pool is broken, processing %s inline", function.__name__)
+            pool, self.pool = self.pool, None
+            if pool is not None:
+                pool.shutdown(wait=False)
+            return function(raw, *args)
+        finally:
+            self.in_flight -= 1
+            increment("offload_tasks_total", task=function.__name__, mode="process")
+            observe("offload_duration_seconds", time.perf_counter() - start_time, task=function.__name__)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "offloaded_total": self.offloaded_total,
+            "inline_total": self.inline_total,
+        }
+
+
+async def offload(function, raw, *args):
+    """
+    Run a room task through the shared OffloadPool, see OffloadPool.run.
+    """
+    return await OffloadPool.get_instance().run(function, raw, *args)
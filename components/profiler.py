@@ -0,0 +1,79 @@
+import asyncio
+import cProfile
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_MAX_SECONDS = 60
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+
+_profile_lock = threading.Lock()
+
+
+class ProfileInProgress(Exception):
+    pass
+
+
+async def profile_cpu(seconds: float) -> bytes:
+    """
+    Profile everything the event loop runs for `seconds` with cProfile.
+
+    Returns:
+        bytes: The profile in the pstats file format, readable with pstats.Stats or snakeviz.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfileInProgress()
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        profiler.create_stats()
+        return marshal.dumps(profiler.stats)
+    finally:
+        _profile_lock.release()
+
+
+async def profile_stacks(seconds: float, interval: float = SAMPLE_INTERVAL) -> str:
+    """
+    Sample the stack of the event loop thread every `interval` seconds for `seconds`. Sampling adds almost
+    no overhead to the profiled code, unlike cProfile.
+
+    Returns:
+        str: The samples as collapsed stacks ("frame;frame;frame count" per line), the input format of
+        flamegraph.pl and speedscope.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfileInProgress()
+    try:
+        loop_thread_id = threading.get_ident()
+        stacks = Counter()
+        stopped = threading.Event()
+
+        def sample():
+            while not stopped.wait(interval):
+                frame = sys._current_frames().get(loop_thread_id)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks[";".join(reversed(names))] += 1
+
+        sampler = threading.Thread(target=sample, name="stack-sampler", daemon=True)
+        start_time = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stopped.set()
+            await asyncio.to_thread(sampler.join)
+
+        header = f"# {sum(stacks.values())} samples in {time.perf_counter() - start_time:.1f}s\n"
+        return header + "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    finally:
+        _profile_lock.release()
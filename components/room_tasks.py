@@ -0,0 +1,63 @@
+"""
+CPU-heavy room list processing: JSON decode, RoomsData validation and reduction.
+
+The functions are synchronous and take either the raw JSON text of a room list or its decoded data, so
+they can run inline or in the offload process pool, where only the raw text goes in and the compact result
+comes back out.
+"""
+import json
+
+from components.fields import dump_fields
+from components.transform_data import find_min_price
+from models.rooms import RoomsData, rooms_data_adapter
+
+# Fields a room list cannot be validated without, read from storage next to any selected fields
+ROOM_LIST_REQUIRED_FIELDS = [name for name, field in RoomsData.model_fields.items() if field.is_required()]
+
+
+def parse_rooms(hotel_data):
+    """
+    Validate room list data, raw JSON text or decoded, into a list of RoomsData models.
+    """
+    # Most of a room list is in fields typed Any, which json.loads decodes faster than validate_json
+    if isinstance(hotel_data, (str, bytes)):
+        hotel_data = json.loads(hotel_data)
+
+    # Ensure hotel_data is a list
+    if isinstance(hotel_data, list):
+        return rooms_data_adapter.validate_python(hotel_data)
+
+    # Handle the case where hotel_data is not a list
+    if hotel_data:
+        return [RoomsData.model_validate(hotel_data)]  # Wrap in a list to match the response_model type
+
+    return None  # If no data, return None or appropriate response
+
+
+def render_room_list(raw, fields=None) -> bytes:
+    """
+    Validate a room list and return the /room-list response body as JSON bytes, limited to the field tree
+    of a fields= selector if one is given.
+    """
+    rooms = parse_rooms(raw)
+    if rooms is None:
+        return b"null"
+    if fields:
+        return dump_fields(rooms_data_adapter.dump_python(rooms, mode="json", by_alias=True), fields)
+    return rooms_data_adapter.dump_json(rooms, by_alias=True)
+
+
+def summarize_room_list(raw, hotel_id, hotel_name, available_rooms_only=False) -> dict:
+    """
+    Validate a room list and reduce it to the lowest price of the hotel.
+    """
+    rooms = parse_rooms(raw)
+    room_list = rooms_data_adapter.dump_python(rooms) if rooms else []
+    return find_min_price({'hotel_id': hotel_id, 'name': hotel_name}, room_list, available_rooms_only)
+
+
+def warm_up():
+    """
+    Run once per worker process so the imports are done before the first real task.
+    """
+    return True
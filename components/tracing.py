@@ -0,0 +1,134 @@
+import functools
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+
+from components.custom_logger import get_logger
+
+load_dotenv()
+
+logger = get_logger("trace")
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.0))  # Share of requests whose spans are logged
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 1000))  # Requests slower than this are always logged, 0 disables
+TRACE_MAX_SPANS = 200  # Spans kept per request for the trace log, the Server-Timing totals include all of them
+
+current_trace: ContextVar = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    The spans of one request. Concurrent tasks of the request, e.g. under asyncio.gather, share the trace, so
+    the time of a phase is the sum of its spans and can exceed the wall time of the request.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.totals = {}  # phase -> [total seconds, spans]
+        self.spans = []
+
+    def add(self, name, start, duration, attributes):
+        total = self.totals.setdefault(name, [0.0, 0])
+        total[0] += duration
+        total[1] += 1
+        if len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append({"name": name, "start_ms": round((start - self.start) * 1000, 3),
+                               "duration_ms": round(duration * 1000, 3), **attributes})
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def server_timing(self):
+        """
+        Return the Server-Timing header value, one entry per phase plus the total.
+        """
+        entries = [f'{name};dur={total * 1000:.1f};desc="{count} spans"'
+                   for name, (total, count) in self.totals.items()]
+        entries.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(entries)
+
+
+class Span:
+    """
+    Times a block as a phase of the current request. The measured time is kept in `duration` also when no
+    request is traced, so callers can report it elsewhere.
+    """
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+        self.duration = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(self.name, self.start, self.duration, self.attributes)
+        return False
+
+
+def span(name, **attributes):
+    """
+    Return a context manager timing a block as a span, e.g. `with span("redis"):`.
+    """
+    return Span(name, attributes)
+
+
+def traced(name):
+    """
+    Decorator timing every call of a coroutine function as a span.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with span(name, function=function.__name__):
+                return await function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start_trace():
+    trace = Trace()
+    return trace, current_trace.set(trace)
+
+
+def finish_trace(trace: Trace, token, request, response):
+    """
+    Add the Server-Timing header and log the spans of sampled or slow requests. The response is None when the
+    request raised, it is then logged with status 500.
+
+    Slow requests are logged at WARNING, so the sampling and rate limits of INFO records never drop them.
+    """
+    current_trace.reset(token)
+    elapsed_ms = trace.elapsed_ms()
+    status = response.status_code if response is not None else 500
+    if SERVER_TIMING_ENABLED and response is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+
+    slow = bool(TRACE_SLOW_MS) and elapsed_ms > TRACE_SLOW_MS
+    if slow or random.random() < TRACE_SAMPLE_RATE:
+        # The spans are passed as structured fields, the JSON log formatter writes them as keys of the line
+        logger.log(logging.WARNING if slow else logging.INFO, "Request trace %s %s %d in %.1f ms", request.method,
+                   request.url.path, status, elapsed_ms, extra={
+                       "method": request.method,
+                       "path": request.url.path,
+                       "query": str(request.url.query),
+                       "status": status,
+                       "duration_ms": round(elapsed_ms, 3),
+                       "slow": slow,
+                       "phases": {name: {"duration_ms": round(total * 1000, 3), "spans": count}
+                                  for name, (total, count) in trace.totals.items()},
+                       "spans": trace.spans,
+                   })
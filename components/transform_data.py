@@ -4,8 +4,10 @@ from typing import List, Dict, Union
 from components.translator import async_translate
 from models.rooms import RoomsData
 from components.facilities import map_facility_ids, facilities
+from components.tracing import traced
 
 
+@traced("transform")
 async def transform_data(input_data):
     """
     Asynchronously transforms the input data to return the hotel data with facilities and other relevant information.
@@ -129,6 +131,7 @@ async def transform_data(input_data):
     }
 
 
+@traced("transform")
 async def transform_room_data(room_data: List[Union[RoomsData, Dict]],
                               disable_google_translations: bool = False) -> Dict:
     """
@@ -216,7 +219,16 @@ async def transform_room_data(room_data: List[Union[RoomsData, Dict]],
     return {"rooms": rooms_transformed}
 
 
+@traced("transform")
 async def extract_hotel_data(hotel_response, room_response, available_rooms_only=False):
+    return find_min_price(hotel_response, room_response, available_rooms_only)
+
+
+def find_min_price(hotel_response, room_response, available_rooms_only=False):
+    """
+    Reduce the room list of a hotel to its lowest price and currency. Synchronous, so it can also run in a
+    worker process, see components/room_tasks.py.
+    """
     if isinstance(room_response, dict) and 'block' in room_response:
         room_response_list = room_response['block']
     elif isinstance(room_response, list):
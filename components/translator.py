@@ -1,18 +1,29 @@
 import asyncio
+import time
+
 from deep_translator import GoogleTranslator
 
+from components.metrics import increment, observe
+from components.tracing import span
+
 
 # Define an async function to handle translation with error handling
 async def async_translate(text, source_lang="en", target_lang="es"):
+    start_time = time.perf_counter()
     try:
         # Run the blocking translation in a separate thread
-        translation = await asyncio.to_thread(
-            GoogleTranslator(source=source_lang, target=target_lang).translate,
-            text
-        )
+        with span("translate", target_lang=target_lang):
+            translation = await asyncio.to_thread(
+                GoogleTranslator(source=source_lang, target=target_lang).translate,
+                text
+            )
+        increment("translation_requests_total", target_lang=target_lang, status="ok")
         return translation
     except Exception as e:
         # Log the error (you can replace this with a logger if needed)
         print(f"Translation error for {target_lang}: {e}")
+        increment("translation_requests_total", target_lang=target_lang, status="error")
         # Return the original text in case of an error
         return text
+    finally:
+        observe("translation_duration_seconds", time.perf_counter() - start_time, target_lang=target_lang)
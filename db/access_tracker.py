@@ -0,0 +1,56 @@
+import json
+from collections import Counter
+
+from redis.asyncio import Redis
+
+ACCESS_PARAMS_TTL = 7 * 24 * 3600  # Params of keys not accessed for a week are forgotten
+
+
+def access_counts_key(endpoint):
+    return f"access_counts_{endpoint}"
+
+
+def access_params_key(cache_key):
+    return f"access_params:{{{cache_key}}}"
+
+
+class AccessTracker:
+    """
+    Counts cache key accesses per endpoint in memory and flushes them to a Redis sorted set per endpoint.
+
+    Recording an access is a dict update, so the request path does not pay a Redis round-trip. The params
+    of each key are flushed as well, so the refresh scheduler can fetch the key again.
+    """
+    _instance = None
+
+    def __init__(self):
+        self.counts = Counter()  # (endpoint, cache_key) -> accesses since the last flush
+        self.params = {}  # cache_key -> (params, expire_hours)
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def record(self, endpoint, cache_key, params, expire_hours):
+        self.counts[(endpoint, cache_key)] += 1
+        self.params[cache_key] = (params, expire_hours)
+
+    async def flush(self, redis: Redis):
+        """
+        Add the accesses recorded since the last flush to Redis in one pipeline.
+        """
+        if not self.counts:
+            return
+
+        counts, self.counts = self.counts, Counter()
+        params, self.params = self.params, {}
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for (endpoint, cache_key), count in counts.items():
+                pipe.zincrby(access_counts_key(endpoint), count, cache_key)
+            for cache_key, (key_params, expire_hours) in params.items():
+                pipe.set(access_params_key(cache_key), json.dumps({"params": key_params, "expire_hours": expire_hours}),
+                         ex=ACCESS_PARAMS_TTL)
+            await pipe.execute()
@@ -0,0 +1,95 @@
+import hashlib
+
+MAX_KEY_LENGTH = 200  # Longer keys are replaced by a hash
+
+# Redis key prefix per API endpoint
+KEY_PREFIXES = {
+    "data": "hotel_data",
+    "photos": "hotel_photos",
+    "reviews": "hotel_reviews",
+    "room-list": "hotel_room_list",
+}
+
+# Redis keys of cached data, cleared on startup: endpoint data and their rendered responses, negative cache
+# entries, composed responses and review indexes. Metrics, circuit breaker, access tracking and lock keys are
+# shared by all workers and kept.
+CACHE_KEY_PATTERNS = [f"{prefix}:*" for prefix in KEY_PREFIXES.values()] + [
+    "negative:*", "detailed_hotel:*", "reviews-local:*", "review-index:*",
+]
+
+# Comma separated params where the order of the values does not matter
+UNORDERED_LIST_PARAMS = {"customer_type"}
+
+# Params compared case-insensitively
+LOWERCASE_PARAMS = {"locale", "language_filter"}
+
+# Param values the API treats the same as leaving the param out
+DEFAULT_PARAMS = {
+    "room-list": {"children_ages": "0", "children_number_by_rooms": "0"},
+}
+
+
+def normalize_params(endpoint, params):
+    """
+    Normalize API params so equivalent requests produce identical params.
+
+    None, empty and default values are dropped, case-insensitive values are lowercased and the values of
+    unordered comma separated lists are trimmed and sorted.
+
+    Args:
+        endpoint (str): The API endpoint the params belong to.
+        params (dict): The query parameters of the request.
+
+    Returns:
+        dict: The normalized params, sorted by name.
+    """
+    defaults = DEFAULT_PARAMS.get(endpoint, {})
+    normalized = {}
+
+    for name in sorted(params):
+        value = params[name]
+        if value is None or value == "":
+            continue
+
+        if isinstance(value, str):
+            value = value.strip()
+            if name in LOWERCASE_PARAMS:
+                value = value.lower()
+            if name in UNORDERED_LIST_PARAMS:
+                value = ",".join(sorted(item.strip() for item in value.split(",") if item.strip()))
+
+        if name in defaults and str(value) == defaults[name]:
+            continue
+
+        normalized[name] = value
+
+    return normalized
+
+
+def build_cache_key(endpoint, params):
+    """
+    Build the canonical cache key of a request, shared by Redis and the MongoDB lookup filter.
+
+    Args:
+        endpoint (str): The API endpoint the params belong to.
+        params (dict): The query parameters of the request.
+
+    Returns:
+        str: The cache key, for example 'hotel_data:hotel_id=4469654&locale=en-gb'.
+    """
+    prefix = KEY_PREFIXES.get(endpoint, endpoint)
+    normalized = normalize_params(endpoint, params)
+    cache_key = f"{prefix}:" + "&".join(f"{name}={value}" for name, value in normalized.items())
+
+    if len(cache_key) > MAX_KEY_LENGTH:
+        cache_key = f"{prefix}:sha1:{hashlib.sha1(cache_key.encode('utf-8')).hexdigest()}"
+
+    return cache_key
+
+
+def response_cache_key(cache_key, variant=None):
+    """
+    Return the Redis key of the rendered response cached for a cache key, see db/response_cache.py. Responses
+    limited to some fields are stored under their own key per variant, see components/fields.py.
+    """
+    return f"{cache_key}:response:{variant}" if variant else f"{cache_key}:response"
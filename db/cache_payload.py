@@ -0,0 +1,38 @@
+import base64
+import gzip
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 64 * 1024))  # Smaller payloads stay plain JSON, 0 disables
+CACHE_COMPRESS_LEVEL = int(os.getenv("CACHE_COMPRESS_LEVEL", 1))  # gzip level, low levels keep ingest cheap
+COMPRESSED_PREFIX = "gz:"  # No JSON text starts with 'g', so plain and compressed values can't be confused
+
+
+def encode_payload(raw):
+    """
+    Return the value stored in Redis for a raw JSON response body.
+
+    Bodies of at least CACHE_COMPRESS_MIN_BYTES are gzip compressed. The Redis client decodes responses as
+    text, so compressed values are stored base64 encoded behind COMPRESSED_PREFIX.
+
+    Args:
+        raw (bytes | bytearray): The raw JSON response body.
+
+    Returns:
+        str | bytes: The compressed value, or the body itself.
+    """
+    if CACHE_COMPRESS_MIN_BYTES and len(raw) >= CACHE_COMPRESS_MIN_BYTES:
+        return COMPRESSED_PREFIX + base64.b64encode(gzip.compress(raw, CACHE_COMPRESS_LEVEL)).decode("ascii")
+    return bytes(raw)
+
+
+def decode_payload(value):
+    """
+    Return the raw JSON text or bytes of a value written by encode_payload, or of a plain JSON value.
+    """
+    if isinstance(value, str) and value.startswith(COMPRESSED_PREFIX):
+        return gzip.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX):]))
+    return value
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+from components.custom_logger import get_logger
+from db.cache_keys import response_cache_key
+from db.storage import get_storage
+
+load_dotenv()
+
+logger = get_logger("cache_writer")
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 100))  # Max writes flushed at once
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.05))  # Seconds to gather a batch
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", 10000))  # Producers wait when the queue is full
+
+
+class CacheWriter:
+    """
+    Write-behind queue for Redis and storage cache writes.
+
+    Writes are enqueued right after an API response is parsed and flushed in the background: Redis SETs go
+    through a single pipeline and storage upserts through one put_many per collection. Until a write is
+    flushed, its payload is kept in `pending` so the same worker does not fetch it from the API again.
+    """
+    _instance = None
+
+    def __init__(self, batch_size: int = WRITE_BEHIND_BATCH_SIZE, flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+                 max_queue: int = WRITE_BEHIND_MAX_QUEUE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.pending = {}  # cache_key -> Redis value waiting to be flushed
+        self.task = None
+        self.flushed_total = 0
+        self.failed_total = 0
+        self.last_flush_seconds = 0.0
+        self.last_batch_size = 0
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def start(self):
+        """
+        Start the background flush task if it is not running yet.
+        """
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def enqueue(self, redis, cache_key, raw_text, expire_seconds, collection, document):
+        """
+        Queue a Redis SET and a storage upsert for a freshly fetched API response.
+
+        The response rendered from the previous data is dropped right away, before the caller renders and
+        caches the response of the new data, so the flush does not delete that fresh response again.
+
+        Args:
+            redis (Redis): The Redis client to write the cache entry to.
+            cache_key (str): The Redis key of the entry.
+            raw_text (str | bytes): The Redis value of the response, see encode_payload.
+            expire_seconds (int): The expiration time of the Redis entry in seconds.
+            collection (str): The storage collection of the document.
+            document (dict): The full document to upsert, matched on its cache key.
+        """
+        self.start()
+        self.pending[cache_key] = raw_text
+        await redis.delete(response_cache_key(cache_key))
+        await self.queue.put((redis, cache_key, raw_text, expire_seconds, collection, document))
+
+    def get_pending(self, cache_key):
+        """
+        Return the Redis value of a write that has not been flushed yet, or None.
+        """
+        return self.pending.get(cache_key)
+
+    def stats(self):
+        """
+        Return the queue depth and flush statistics of the writer.
+        """
+        return {
+            "queue_depth": self.queue.qsize(),
+            "pending_keys": len(self.pending),
+            "flushed_total": self.flushed_total,
+            "failed_total": self.failed_total,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+    async def close(self):
+        """
+        Flush every queued write and stop the background task.
+        """
+        if self.task is None or self.task.done():
+            return
+        await self.queue.put(None)  # Sentinel, the task flushes what it has and exits
+        await self.task
+        logger.info("Write-behind queue flushed on shutdown: %s", self.stats())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stop:
+                # Drain whatever was queued behind the sentinel before exiting
+                while not self.queue.empty():
+                    remaining = [self.queue.get_nowait() for _ in range(min(self.queue.qsize(), self.batch_size))]
+                    await self._flush([write for write in remaining if write is not None])
+                return
+
+    async def _flush(self, batch):
+        if not batch:
+            return
+
+        start_time = time.perf_counter()
+
+        # Group the writes per Redis client and per storage collection
+        redis_writes = {}
+        storage_writes = {}
+        for redis, cache_key, raw_text, expire_seconds, collection, document in batch:
+            redis_writes.setdefault(id(redis), (redis, []))[1].append((cache_key, raw_text, expire_seconds))
+            storage_writes.setdefault(collection, []).append(document)
+
+        try:
+            for redis, writes in redis_writes.values():
+                async with redis.pipeline(transaction=False) as pipe:
+                    for cache_key, raw_text, expire_seconds in writes:
+                        pipe.set(cache_key, raw_text, ex=expire_seconds)
+                    await pipe.execute()
+
+            storage = get_storage()
+            for collection, documents in storage_writes.items():
+                await storage.put_many(collection, documents)
+
+            self.flushed_total += len(batch)
+        except Exception as e:
+            self.failed_total += len(batch)
+            logger.error(f"Write-behind flush of {len(batch)} writes failed: {str(e)}")
+        finally:
+            for _, cache_key, raw_text, *_ in batch:
+                if self.pending.get(cache_key) is raw_text:
+                    del self.pending[cache_key]
+
+        self.last_batch_size = len(batch)
+        self.last_flush_seconds = time.perf_counter() - start_time
+        logger.info("Flushed %d cache writes in %.1f ms, queue depth: %d", len(batch),
+                    self.last_flush_seconds * 1000, self.queue.qsize())
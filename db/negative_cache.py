@@ -0,0 +1,78 @@
+import json
+import os
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from redis.asyncio import Redis
+
+from components.custom_logger import get_logger
+
+load_dotenv()
+
+logger = get_logger("negative_cache")
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", 300))  # Default to 5 minutes
+NEGATIVE_CACHE_STATUS_CODES = {400, 404, 410, 422}  # Upstream errors that will not change on retry
+
+# Error types stored in negative cache entries
+NOT_FOUND = "not_found"
+EMPTY_RESULT = "empty_result"
+ERROR_PAYLOAD = "error_payload"
+CLIENT_ERROR = "client_error"
+
+
+def negative_cache_key(cache_key):
+    # The hash tag keeps the entry in the same cluster slot as the cache key, so both fit in one MGET
+    return f"negative:{{{cache_key}}}"
+
+
+def get_negative_ttl(endpoint):
+    """
+    Return the negative cache TTL of an endpoint, e.g. NEGATIVE_CACHE_TTL_ROOM_LIST for 'room-list'.
+    """
+    return int(os.getenv(f"NEGATIVE_CACHE_TTL_{endpoint.upper().replace('-', '_')}", NEGATIVE_CACHE_TTL))
+
+
+def classify_result(data):
+    """
+    Return the negative cache error type of a successful API response, or None if the data is usable.
+    """
+    if data is None or data == [] or data == {}:
+        return EMPTY_RESULT
+    if isinstance(data, dict) and ("error" in data or "errors" in data or set(data) <= {"message", "status", "detail"}):
+        return ERROR_PAYLOAD
+    return None
+
+
+async def store_negative(redis: Redis, endpoint, cache_key, error_type, status_code, detail, data=None):
+    """
+    Store a short-lived negative cache entry for a request.
+
+    Args:
+        redis (Redis): The Redis client instance.
+        endpoint (str): The API endpoint, used to pick the TTL.
+        cache_key (str): The cache key of the request.
+        error_type (str): One of NOT_FOUND, EMPTY_RESULT, ERROR_PAYLOAD or CLIENT_ERROR.
+        status_code (int): The status code returned to clients on a hit.
+        detail (str): The error detail returned to clients on a hit.
+        data: The payload returned on a hit when status_code is a success, e.g. an empty room list.
+    """
+    entry = {"error_type": error_type, "status_code": status_code, "detail": detail, "data": data}
+    ttl = get_negative_ttl(endpoint)
+    await redis.set(negative_cache_key(cache_key), json.dumps(entry), ex=ttl)
+    logger.info("Negative cache entry stored for key: %s (%s, %ss)", cache_key, error_type, ttl)
+
+
+def resolve_negative(raw_entry):
+    """
+    Turn a negative cache entry back into the response of the original request.
+
+    Returns:
+        The cached payload for empty results and error payloads the API answered with a success status.
+
+    Raises:
+        HTTPException: For cached upstream error responses.
+    """
+    entry = json.loads(raw_entry)
+    if entry["status_code"] < 400:
+        return entry.get("data")
+    raise HTTPException(status_code=entry["status_code"], detail=entry["detail"])
@@ -1,14 +1,22 @@
 import asyncio
 import os
-import httpx
 import json
 from dotenv import load_dotenv
 from redis.asyncio import Redis
 from fastapi import HTTPException
 from components.custom_logger import get_logger
+from components.metrics import increment, observe
+from components.tracing import span
 from datetime import datetime, timezone, timedelta
 
-from db.mdb_client import booking_db
+from db.access_tracker import AccessTracker
+from db.cache_keys import CACHE_KEY_PATTERNS, build_cache_key, normalize_params
+from db.cache_payload import decode_payload, encode_payload
+from db.cache_writer import CacheWriter
+from db.negative_cache import (NEGATIVE_CACHE_STATUS_CODES, NOT_FOUND, CLIENT_ERROR, classify_result, store_negative,
+                               negative_cache_key, resolve_negative)
+from db.storage import get_storage
+from db.upstream import RETRYABLE_STATUS_CODES, UpstreamError, request_with_retries
 
 load_dotenv()
 
@@ -17,6 +25,8 @@ timezone_offset_hours = int(os.getenv("TIMEZONE_OFFSET_HOURS", 0))  # Default to
 env_expire_hours = int(os.getenv("EXPIRE_HOURS", 72))  # Default to 72 hours
 MAX_CONNECTIONS = 2  # Max 3 connections per second
 RATE_LIMIT_EXPIRE_SECONDS = 1  # Redis lock expiration time
+CACHE_COLLECTIONS = ["data", "photos", "reviews", "room-list"]  # Storage collections, one per API endpoint
+RAPIDAPI_BASE_URL = os.getenv("RAPIDAPI_BASE_URL")  # Default to https://RAPIDAPI_HOST, override for a local simulator
 
 # Lua script to ensure atomic rate-limiting
 RATE_LIMIT_LUA_SCRIPT = """
@@ -50,84 +60,173 @@ async def acquire_rate_limit(redis: Redis, key: str, max_requests: int, expire_t
     Returns:
         None: It will wait until the request can proceed.
     """
-    while True:
-        # Run the Lua script to manage rate-limiting atomically
-        result = await redis.eval(
-            RATE_LIMIT_LUA_SCRIPT,  # The Lua script
-            1,  # Number of keys
-            key,  # The key being rate-limited
-            expire_time,  # Expiration time for the key (seconds)
-            max_requests  # Maximum number of requests allowed
-        )
-
-        if result == 1:
-            # If allowed, break the loop and proceed
-            break
-        else:
-            # If not allowed, wait and retry
-            logger.info(f"Rate limit exceeded for {key}, waiting before retrying...")
-            await asyncio.sleep(0.1)  # Sleep for 100ms before retrying
+    with span("rate-limit") as timer:
+        while True:
+            # Run the Lua script to manage rate-limiting atomically
+            result = await redis.eval(
+                RATE_LIMIT_LUA_SCRIPT,  # The Lua script
+                1,  # Number of keys
+                key,  # The key being rate-limited
+                expire_time,  # Expiration time for the key (seconds)
+                max_requests  # Maximum number of requests allowed
+            )
+
+            if result == 1:
+                # If allowed, break the loop and proceed
+                break
+            else:
+                # If not allowed, wait and retry
+                logger.info("Rate limit exceeded for %s, waiting before retrying...", key)
+                await asyncio.sleep(0.1)  # Sleep for 100ms before retrying
+    observe("rate_limit_wait_seconds", timer.duration)
+
+
+def is_document_fresh(document, expire_hours: int = env_expire_hours):
+    """
+    Check whether a stored document is still within its expiration window.
+
+    Args:
+        document (dict): The stored document, expected to hold an ISO formatted 'created_at' field.
+        expire_hours (int): The number of hours the document stays valid.
+
+    Returns:
+        bool: True if the document has not expired yet.
+    """
+    created_at = document.get("created_at")
+    if not created_at:
+        logger.warning("Document %s found but missing 'created_at' field", document.get("_id"))
+        return False
+
+    created_at_datetime = datetime.fromisoformat(created_at)
+    expire_datetime = created_at_datetime + timedelta(hours=expire_hours)
+
+    current_time_with_offset = datetime.now(timezone(timedelta(hours=timezone_offset_hours)))
+    return current_time_with_offset < expire_datetime
+
+
+async def fetch_from_api(url, headers, params, cache_key, expire_seconds, redis: Redis, collection,
+                         stale_document=None):
+    """
+    Fetch data from the API under the shared rate limit. The response body is read into one buffer and
+    decoded once, and its Redis and storage writes are queued on the CacheWriter instead of being awaited.
+    Large bodies are stored compressed, see encode_payload.
+
+    The call is retried with backoff and guarded by the shared circuit breaker. If it still fails with a
+    server error, or the circuit is open, the expired stale_document is served instead when there is one.
+    Client errors that will not change on retry, e.g. a hotel that no longer exists, are negatively cached
+    and the stale document is deleted, so it is not served or refetched again.
+    """
+    # Apply Redis-based rate limiting logic before every attempt
+    rate_limit_key = "httpx_rate_limit"
+
+    async def acquire_slot():
+        await acquire_rate_limit(redis, rate_limit_key, MAX_CONNECTIONS, RATE_LIMIT_EXPIRE_SECONDS)
+
+    try:
+        response, body = await request_with_retries(url, headers, params, redis, collection, acquire_slot)
+    except UpstreamError as e:
+        if e.status_code in NEGATIVE_CACHE_STATUS_CODES:
+            error_type = NOT_FOUND if e.status_code in (404, 410) else CLIENT_ERROR
+            await store_negative(redis, collection, cache_key, error_type, e.status_code, e.detail)
+            if stale_document is not None:
+                await get_storage().delete_many(collection, [cache_key])
+                logger.info("Deleted stale document for key: %s after upstream error: %s", cache_key, e.status_code)
+        elif stale_document is not None and (e.status_code >= 500 or e.status_code in RETRYABLE_STATUS_CODES):
+            logger.warning("Serving stale data for key: %s after upstream failure: %s", cache_key, e.status_code)
+            increment("cache_requests_total", endpoint=collection, tier="stale")
+            return stale_document.get("data")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    data = json.loads(body)
+    increment("cache_requests_total", endpoint=collection, tier="upstream")
+
+    # Empty results and error payloads only get a short-lived negative cache entry
+    error_type = classify_result(data)
+    if error_type:
+        await store_negative(redis, collection, cache_key, error_type, response.status_code, "", data)
+        return data
+
+    # Hand the Redis and storage writes to the write-behind queue and return right away
+    current_time_with_offset = datetime.now(timezone(timedelta(hours=timezone_offset_hours)))
+    document_to_insert = {
+        **params,
+        "cache_key": cache_key,
+        "data": data,
+        "created_at": current_time_with_offset.isoformat()
+    }
+
+    await CacheWriter.get_instance().enqueue(redis, cache_key, encode_payload(body), expire_seconds, collection,
+                                             document_to_insert)
+    logger.info("Data fetched from API and queued for caching with key: %s", cache_key)
+
+    return data
 
 
 async def fetch_and_cache(url, headers, params, cache_key, expire_seconds, redis: Redis, collection,
-                          expire_hours: int = env_expire_hours):
+                          expire_hours: int = env_expire_hours, fields=None):
     """
-    Fetch data from MongoDB or API and cache it in Redis. The document is fetched from the API if expired.
+    Fetch data from the storage backend or API and cache it in Redis. The document is fetched from the API if expired.
+    With a field tree only those fields are read from storage; data fetched from the API is returned whole.
     """
 
-    logger.info("Attempting to load data from MongoDB for params: %s", params)
+    logger.debug("Attempting to load data from storage for key: %s", cache_key)
 
-    document = await booking_db[collection].find_one(params)
+    with span("storage", collection=collection) as timer:
+        document = await get_storage().get(collection, cache_key, fields)
+    observe("cache_tier_duration_seconds", timer.duration, endpoint=collection, tier="storage")
 
     if document:
-        created_at = document.get("created_at")
-        if created_at:
-            created_at_datetime = datetime.fromisoformat(created_at)
-            expire_datetime = created_at_datetime + timedelta(hours=expire_hours)
-
-            current_time_with_offset = datetime.now(timezone(timedelta(hours=timezone_offset_hours)))
-            if current_time_with_offset < expire_datetime:
-                logger.info("Data found in MongoDB for params: %s", params)
-                return document.get("data")
-            else:
-                logger.info("Document expired for params: %s, fetching fresh data", params)
-        else:
-            logger.warning("Document for params: %s found but missing 'created_at' field", params)
+        if is_document_fresh(document, expire_hours):
+            logger.debug("Data found in storage for key: %s", cache_key)
+            increment("cache_requests_total", endpoint=collection, tier="storage")
+            return document.get("data")
+        logger.info("Document expired for key: %s, fetching fresh data", cache_key)
     else:
-        logger.info("No data found in MongoDB. Fetching data from API for params: %s", params)
+        logger.info("No data found in storage. Fetching data from API for key: %s", cache_key)
 
-    # Apply Redis-based rate limiting logic
-    rate_limit_key = "httpx_rate_limit"
-    await acquire_rate_limit(redis, rate_limit_key, MAX_CONNECTIONS, RATE_LIMIT_EXPIRE_SECONDS)
+    return await fetch_from_api(url, headers, params, cache_key, expire_seconds, redis, collection, document)
 
-    try:
-        async with httpx.AsyncClient(timeout=120) as client:
-            try:
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"HTTP error occurred: {e.response.text}")
-                raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
-            except Exception as e:
-                logger.error(f"An error occurred: {str(e)}")
-                raise HTTPException(status_code=500, detail=str(e))
-
-        await redis.set(cache_key, response.text, ex=expire_seconds)
-        logger.info("Data fetched from API and cached in Redis with key: %s", cache_key)
-
-        current_time_with_offset = datetime.now(timezone(timedelta(hours=timezone_offset_hours)))
-        document_to_insert = {
-            **params,
-            "data": response.json(),
-            "created_at": current_time_with_offset.isoformat()
-        }
 
-        await booking_db[collection].replace_one(params, document_to_insert, upsert=True)
-        logger.info("Data inserted or updated in MongoDB for params: %s", params)
+async def fetch_many_and_cache(url, headers, params_list, cache_keys, expire_seconds, redis: Redis, collection,
+                               expire_hours: int = env_expire_hours):
+    """
+    Batch version of fetch_and_cache: resolve all cache keys with one storage lookup and fetch only
+    the missing or expired documents from the API.
+
+    Returns:
+        list: The data for each params dict, in the same order as params_list.
+    """
+    logger.debug("Attempting to load %d documents from storage collection: %s", len(params_list), collection)
+
+    with span("storage", collection=collection, keys=len(cache_keys)) as timer:
+        documents = await get_storage().get_many(collection, cache_keys)
+    observe("cache_tier_duration_seconds", timer.duration, endpoint=collection, tier="storage")
+
+    results = [None] * len(params_list)
+    missing = {}
+    for index, cache_key in enumerate(cache_keys):
+        document = documents.get(cache_key)
+        if document and is_document_fresh(document, expire_hours):
+            results[index] = document.get("data")
+        else:
+            missing.setdefault(cache_key, []).append(index)
+
+    found = len(params_list) - sum(map(len, missing.values()))
+    logger.info("Found %d of %d documents in storage, fetching %d from API", found, len(params_list), len(missing))
+    increment("cache_requests_total", found, endpoint=collection, tier="storage")
+    observe("upstream_fanout_size", len(missing), endpoint=collection)
+
+    # Fetch each distinct missing document once
+    fetched = await asyncio.gather(
+        *[fetch_from_api(url, headers, params_list[indexes[0]], cache_key, expire_seconds, redis, collection,
+                         documents.get(cache_key))
+          for cache_key, indexes in missing.items()]
+    )
+    for indexes, data in zip(missing.values(), fetched):
+        for index in indexes:
+            results[index] = data
 
-        return response.json()
-    finally:
-        pass  # The rate-limiting is handled automatically by Redis expiration
+    return results
 
 
 # async def fetch_and_cache(url, headers, params, cache_key, expire_seconds, redis: Redis, collection,
@@ -192,29 +291,58 @@ async def fetch_and_cache(url, headers, params, cache_key, expire_seconds, redis
 #     return response.json()
 
 
-# Helper function to get data from Redis or fetch and cache it
-async def get_data_or_cache(endpoint, params, cache_key, expire_seconds, redis, expire_hours: int = env_expire_hours):
+async def mget(redis, keys):
     """
-    Get data from Redis or fetch and cache it if not available.
+    Get many keys in one round-trip, also in cluster mode where the keys may live in different slots.
+    """
+    if hasattr(redis, "mget_nonatomic"):
+        return await redis.mget_nonatomic(keys)
+    return await redis.mget(keys)
+
+
+async def ensure_cache_indexes():
+    """
+    Create the index on the 'cache_key' field used by every cache lookup, and give documents stored before
+    that field existed their cache key.
+    """
+    await get_storage().ensure_indexes(CACHE_COLLECTIONS)
+    await get_storage().migrate_legacy_documents(CACHE_COLLECTIONS)
+
+
+async def clear_cache_keys(redis: Redis, batch_size: int = 500):
+    """
+    Delete the cached data from Redis, the keys matching CACHE_KEY_PATTERNS, with SCAN instead of FLUSHDB so
+    the state shared by the workers survives a worker start.
+
+    Returns:
+        int: The number of deleted keys.
+    """
+    deleted = 0
+    for pattern in CACHE_KEY_PATTERNS:
+        batch = []
+        async for key in redis.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await redis.delete(*batch)
+                batch = []
+        if batch:
+            deleted += await redis.delete(*batch)
+    return deleted
+
+
+def build_api_request(endpoint):
+    """
+    Build the API URL and request headers for an endpoint.
 
     Args:
-        expire_hours:
         endpoint (str): The API endpoint to fetch data from.
-        params (dict): The query parameters to include in the API request.
-        cache_key (str): The key to use for caching the response in Redis.
-        expire_seconds (int): The expiration time for the cached data in seconds.
-        redis (Redis): The Redis client instance.
 
     Returns:
-        dict: The JSON response from the API or cached data.
+        tuple: The API URL and the request headers.
     """
-    # Check if data exists in the cache
-    cached_data = await redis.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data)
-
     # Construct the API URL
-    url = f"https://{os.getenv('RAPIDAPI_HOST')}/api/v1/hotels/{endpoint}"
+    base_url = RAPIDAPI_BASE_URL or f"https://{os.getenv('RAPIDAPI_HOST')}"
+    url = f"{base_url.rstrip('/')}/api/v1/hotels/{endpoint}"
 
     # API request headers
     headers = {
@@ -222,8 +350,122 @@ async def get_data_or_cache(endpoint, params, cache_key, expire_seconds, redis,
         'x-rapidapi-host': os.getenv("RAPIDAPI_HOST")
     }
 
+    return url, headers
+
+
+# Helper function to get data from Redis or fetch and cache it
+async def get_data_or_cache(endpoint, params, expire_seconds, redis, expire_hours: int = env_expire_hours,
+                            raw: bool = False, fields=None):
+    """
+    Get data from Redis or fetch and cache it if not available.
+
+    Args:
+        expire_hours:
+        endpoint (str): The API endpoint to fetch data from.
+        params (dict): The query parameters to include in the API request, normalized before use.
+        expire_seconds (int): The expiration time for the cached data in seconds.
+        redis (Redis): The Redis client instance.
+        raw (bool): Return cached JSON text as is instead of decoding it, for callers that decode it elsewhere.
+        fields (dict): Field tree from components/fields.py pushed down into the storage lookup. Data from
+            Redis or the API may still hold every field, so callers project the result themselves.
+
+    Returns:
+        dict: The JSON response from the API or cached data, or the cached JSON text when raw is set.
+    """
+    params = normalize_params(endpoint, params)
+    cache_key = build_cache_key(endpoint, params)
+    AccessTracker.get_instance().record(endpoint, cache_key, params, expire_hours)
+
+    # Check if data exists in the cache, including writes that are not flushed yet
+    cached_data = CacheWriter.get_instance().get_pending(cache_key)
+    if cached_data:
+        increment("cache_requests_total", endpoint=endpoint, tier="pending")
+        cached_data = decode_payload(cached_data)
+        return cached_data if raw else json.loads(cached_data)
+
+    # Check the cache and the negative cache in one round-trip, before spending a rate-limited API call
+    with span("redis", endpoint=endpoint) as timer:
+        cached_data, negative_entry = await mget(redis, [cache_key, negative_cache_key(cache_key)])
+    observe("cache_tier_duration_seconds", timer.duration, endpoint=endpoint, tier="redis")
+    if cached_data:
+        increment("cache_requests_total", endpoint=endpoint, tier="redis")
+        cached_data = decode_payload(cached_data)
+        return cached_data if raw else json.loads(cached_data)
+    if negative_entry:
+        increment("cache_requests_total", endpoint=endpoint, tier="negative")
+        return resolve_negative(negative_entry)
+
+    url, headers = build_api_request(endpoint)
+
     # Fetch the data and cache it
-    return await fetch_and_cache(url, headers, params, cache_key, expire_seconds, redis, endpoint, expire_hours)
+    return await fetch_and_cache(url, headers, params, cache_key, expire_seconds, redis, endpoint, expire_hours,
+                                 fields)
+
+
+# Helper function to get many documents from Redis or fetch and cache the missing ones
+async def get_many_data_or_cache(endpoint, params_list, expire_seconds, redis, expire_hours: int = env_expire_hours,
+                                 raw: bool = False):
+    """
+    Batch version of get_data_or_cache. Resolves all keys with a single Redis MGET, the Redis misses with
+    a single storage lookup, and only sends the remaining misses to the API.
+
+    Args:
+        endpoint (str): The API endpoint to fetch data from.
+        params_list (List[dict]): The query parameters of each request, normalized before use.
+        expire_seconds (int): The expiration time for the cached data in seconds.
+        redis (Redis): The Redis client instance.
+        expire_hours (int): The number of hours stored documents stay valid.
+        raw (bool): Return cached JSON text as is instead of decoding it, for callers that decode it elsewhere.
+
+    Returns:
+        list: The JSON response or cached data for each request, in the same order as params_list.
+    """
+    if not params_list:
+        return []
+
+    params_list = [normalize_params(endpoint, params) for params in params_list]
+    cache_keys = [build_cache_key(endpoint, params) for params in params_list]
+    access_tracker = AccessTracker.get_instance()
+    for params, cache_key in zip(params_list, cache_keys):
+        access_tracker.record(endpoint, cache_key, params, expire_hours)
+
+    # Check all keys and their negative cache entries with a single round-trip, including writes that are not
+    # flushed yet
+    observe("fanout_size", len(params_list), endpoint=endpoint)
+    cache_writer = CacheWriter.get_instance()
+    with span("redis", endpoint=endpoint, keys=len(cache_keys)) as timer:
+        values = await mget(redis, cache_keys + [negative_cache_key(cache_key) for cache_key in cache_keys])
+    observe("cache_tier_duration_seconds", timer.duration, endpoint=endpoint, tier="redis")
+    cached_values = [cache_writer.get_pending(cache_key) or value for cache_key, value in zip(cache_keys, values)]
+    negative_entries = values[len(cache_keys):]
+
+    results = [None] * len(params_list)
+    missing = []
+    redis_hits = 0
+    for index, (value, negative_entry) in enumerate(zip(cached_values, negative_entries)):
+        if value:
+            value = decode_payload(value)
+            results[index] = value if raw else json.loads(value)
+            redis_hits += 1
+        elif negative_entry:
+            increment("cache_requests_total", endpoint=endpoint, tier="negative")
+            results[index] = resolve_negative(negative_entry)
+        else:
+            missing.append(index)
+    increment("cache_requests_total", redis_hits, endpoint=endpoint, tier="redis")
+    if not missing:
+        return results
+
+    url, headers = build_api_request(endpoint)
+
+    # Fetch the missing data and cache it
+    fetched = await fetch_many_and_cache(url, headers, [params_list[index] for index in missing],
+                                         [cache_keys[index] for index in missing], expire_seconds, redis, endpoint,
+                                         expire_hours)
+    for index, data in zip(missing, fetched):
+        results[index] = data
+
+    return results
 
 
 # Test block
@@ -241,26 +483,29 @@ if __name__ == "__main__":
             'customer_type': 'solo_traveller,review_category_group_of_friends',
             'language_filter': 'he'
         }
-        cache_key = "hotel_reviews_4469654"
+        cache_key = build_cache_key(endpoint, params)
         expire_seconds = 3600  # Cache expiry time (e.g., 1 hour)
 
         try:
             # Use the get_data_or_cache helper function
-            result = await get_data_or_cache(endpoint, params, cache_key, expire_seconds, redis)
+            result = await get_data_or_cache(endpoint, params, expire_seconds, redis)
 
             # Pretty print the JSON response
             print("API Response (Prettified):")
             print(json.dumps(result, indent=4))
 
-            # Fetch and pretty print the cached value
+            # Flush the write-behind queue, then fetch and pretty print the cached value
+            await CacheWriter.get_instance().close()
             cached_value = await redis.get(cache_key)
             if cached_value:
                 print("\nCached Value (Prettified):")
-                print(json.dumps(json.loads(cached_value.decode()), indent=4))
+                print(json.dumps(json.loads(decode_payload(cached_value)), indent=4))
             else:
                 print("No cache found")
         except HTTPException as e:
             print(f"HTTPException: {e.detail}")
+        finally:
+            await CacheWriter.get_instance().close()
 
 
     # Run the test
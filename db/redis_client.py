@@ -1,4 +1,27 @@
+import asyncio
+import os
+
 import redis.asyncio as aioredis
+from dotenv import load_dotenv
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.sentinel import Sentinel
+
+load_dotenv()
+
+# Connection settings, all optional
+REDIS_URL = os.getenv("REDIS_URL")  # e.g. redis://redis:6379/0, skips host discovery when set
+REDIS_MODE = os.getenv("REDIS_MODE", "standalone")  # standalone, sentinel or cluster
+REDIS_HOSTS = os.getenv("REDIS_HOSTS", "localhost,redis,0.0.0.0").split(",")  # Hosts probed when no URL is set
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 200))  # Pool size per worker
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))  # Seconds to wait for a free pooled connection
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 1))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_PROBE_DEADLINE = float(os.getenv("REDIS_PROBE_DEADLINE", 2))  # Total seconds allowed for host discovery
+REDIS_SENTINELS = os.getenv("REDIS_SENTINELS", "")  # e.g. sentinel-1:26379,sentinel-2:26379
+REDIS_SENTINEL_MASTER = os.getenv("REDIS_SENTINEL_MASTER", "mymaster")
 
 
 class AsyncRedisClient:
@@ -10,15 +33,99 @@ class AsyncRedisClient:
             cls._instance = await cls.create_redis_client()
         return cls._instance
 
+    @staticmethod
+    def connection_options():
+        """
+        Socket and health-check options shared by every connection mode.
+        """
+        return {
+            "decode_responses": True,
+            "socket_connect_timeout": REDIS_SOCKET_CONNECT_TIMEOUT,
+            "socket_timeout": REDIS_SOCKET_TIMEOUT,
+            "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        }
+
+    @staticmethod
+    def create_pool(url):
+        """
+        Create a blocking connection pool, so fan-out requests wait for a free connection instead of failing.
+        """
+        return aioredis.BlockingConnectionPool.from_url(
+            url,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            **AsyncRedisClient.connection_options()
+        )
+
     @staticmethod
     async def create_redis_client():
-        hosts = ['localhost', 'redis', '0.0.0.0']
-        for host in hosts:
+        """
+        Create the Redis client configured by the REDIS_* environment variables.
+
+        Standalone mode connects to REDIS_URL, or probes REDIS_HOSTS in parallel and keeps the first host that
+        answers within REDIS_PROBE_DEADLINE. Sentinel and cluster modes use REDIS_SENTINELS and REDIS_URL.
+        """
+        if REDIS_MODE == "cluster":
+            redis_client = RedisCluster.from_url(
+                REDIS_URL or f"redis://{REDIS_HOSTS[0]}:{REDIS_PORT}",
+                max_connections=REDIS_MAX_CONNECTIONS,
+                **AsyncRedisClient.connection_options()
+            )
+            await asyncio.wait_for(redis_client.initialize(), REDIS_PROBE_DEADLINE)
+            print("Successfully connected to Redis cluster")
+            return redis_client
+
+        if REDIS_MODE == "sentinel":
+            sentinels = [(address.split(":")[0], int(address.split(":")[1]))
+                         for address in REDIS_SENTINELS.split(",") if address]
+            sentinel = Sentinel(sentinels, socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+                                socket_timeout=REDIS_SOCKET_TIMEOUT)
+            redis_client = sentinel.master_for(REDIS_SENTINEL_MASTER, db=REDIS_DB,
+                                               max_connections=REDIS_MAX_CONNECTIONS,
+                                               **AsyncRedisClient.connection_options())
+            await asyncio.wait_for(redis_client.ping(), REDIS_PROBE_DEADLINE)
+            print(f"Successfully connected to Redis master '{REDIS_SENTINEL_MASTER}' through Sentinel")
+            return redis_client
+
+        urls = [REDIS_URL] if REDIS_URL else [f"redis://{host}:{REDIS_PORT}/{REDIS_DB}" for host in REDIS_HOSTS]
+        return await AsyncRedisClient.probe(urls)
+
+    @staticmethod
+    async def probe(urls):
+        """
+        Ping every URL in parallel and return a client for the first one that answers.
+        """
+        async def connect(url):
+            redis_client = aioredis.StrictRedis(connection_pool=AsyncRedisClient.create_pool(url))
             try:
-                redis_client = aioredis.StrictRedis(host=host, port=6379, db=0, decode_responses=True)
-                if await redis_client.ping():
-                    print(f"Successfully connected to Redis server at {host}")
-                    return redis_client
-            except aioredis.ConnectionError as e:
-                print(f"Could not connect to Redis server at {host}: {e}.")
-        raise Exception("Could not connect to any Redis server.")
+                await redis_client.ping()
+            except Exception:
+                await redis_client.aclose()
+                raise
+            return url, redis_client
+
+        tasks = [asyncio.create_task(connect(url)) for url in urls]
+        connected = None
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=REDIS_PROBE_DEADLINE):
+                try:
+                    connected = await next_done
+                    break
+                except (aioredis.ConnectionError, aioredis.TimeoutError, OSError) as e:
+                    print(f"Could not connect to Redis server: {e}.")
+        except asyncio.TimeoutError:
+            print(f"Redis discovery timed out after {REDIS_PROBE_DEADLINE} seconds.")
+        finally:
+            # Cancel the slower probes and close any extra client that connected meanwhile
+            for task in tasks:
+                task.cancel()
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, tuple) and (connected is None or result[1] is not connected[1]):
+                    await result[1].aclose()
+
+        if connected is None:
+            raise Exception("Could not connect to any Redis server.")
+
+        url, redis_client = connected
+        print(f"Successfully connected to Redis server at {url}")
+        return redis_client
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+
+from components.custom_logger import get_logger
+from db.access_tracker import AccessTracker, access_counts_key, access_params_key
+from db.rapidapi_client import (CACHE_COLLECTIONS, MAX_CONNECTIONS, build_api_request, fetch_from_api, mget,
+                                timezone_offset_hours)
+from db.storage import get_storage
+
+load_dotenv()
+
+logger = get_logger("refresh_scheduler")
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "true").lower() == "true"
+REFRESH_INTERVAL_SECONDS = int(os.getenv("REFRESH_INTERVAL_SECONDS", 60))  # Seconds between refresh cycles
+REFRESH_TOP_K = int(os.getenv("REFRESH_TOP_K", 200))  # Hottest keys considered per endpoint
+REFRESH_AHEAD_FRACTION = float(os.getenv("REFRESH_AHEAD_FRACTION", 0.1))  # Refresh in the last 10% of the lifetime
+REFRESH_BUDGET_FRACTION = float(os.getenv("REFRESH_BUDGET_FRACTION", 0.25))  # Share of the upstream rate budget
+ACCESS_DECAY_SECONDS = int(os.getenv("ACCESS_DECAY_SECONDS", 3600))  # Access counts are halved this often
+ACCESS_MAX_TRACKED = int(os.getenv("ACCESS_MAX_TRACKED", 10000))  # Keys kept per endpoint sorted set
+REFRESH_EXPIRE_SECONDS = int(os.getenv("EXPIRE_SECONDS", 5))  # Redis expiration of refreshed entries
+
+
+class RefreshScheduler:
+    """
+    Background task that proactively refreshes the most accessed cache keys shortly before their stored
+    documents expire.
+
+    Every worker flushes its access counts each cycle; the refresh itself runs in one worker at a time,
+    guarded by a Redis lock. A cycle refreshes at most REFRESH_BUDGET_FRACTION of the upstream rate budget.
+    """
+    _instance = None
+
+    def __init__(self):
+        self.redis = None
+        self.task = None
+        self.last_cycle = {}
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def cycle_budget():
+        return max(1, int(MAX_CONNECTIONS * REFRESH_BUDGET_FRACTION * REFRESH_INTERVAL_SECONDS))
+
+    def start(self, redis: Redis):
+        self.redis = redis
+        if REFRESH_ENABLED and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.redis is not None:
+            await AccessTracker.get_instance().flush(self.redis)
+
+    def stats(self):
+        """
+        Return the coverage and budget use of the last refresh cycle run by this worker.
+        """
+        return dict(self.last_cycle)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL_SECONDS)
+            try:
+                await AccessTracker.get_instance().flush(self.redis)
+                # Only one worker refreshes per cycle
+                if await self.redis.set("refresh_scheduler_lock", os.getpid(), nx=True, ex=REFRESH_INTERVAL_SECONDS):
+                    await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Refresh cycle failed: {str(e)}")
+
+    async def run_cycle(self):
+        """
+        Refresh the hottest keys of every endpoint that are about to expire, within the cycle budget.
+        """
+        # Decay at most once per ACCESS_DECAY_SECONDS across all workers
+        if await self.redis.set("access_decay_lock", os.getpid(), nx=True, ex=ACCESS_DECAY_SECONDS):
+            await self.decay()
+
+        budget = self.cycle_budget()
+        hot_keys = refreshed = failed = fresh = skipped = 0
+
+        for endpoint in CACHE_COLLECTIONS:
+            cache_keys = await self.redis.zrevrange(access_counts_key(endpoint), 0, REFRESH_TOP_K - 1)
+            if not cache_keys:
+                continue
+            hot_keys += len(cache_keys)
+
+            candidates, endpoint_fresh = await self.find_candidates(endpoint, cache_keys)
+            fresh += endpoint_fresh
+
+            url, headers = build_api_request(endpoint)
+            for cache_key, params in candidates:
+                if refreshed + failed >= budget:
+                    skipped += 1
+                    continue
+                try:
+                    # The stored document is only loaded for keys that are refreshed, as the stale fallback
+                    document = await get_storage().get(endpoint, cache_key)
+                    await fetch_from_api(url, headers, params, cache_key, REFRESH_EXPIRE_SECONDS, self.redis, endpoint,
+                                         document)
+                    refreshed += 1
+                except Exception as e:
+                    failed += 1
+                    logger.warning(f"Refresh of {cache_key} failed: {str(e)}")
+
+        self.last_cycle = {
+            "hot_keys": hot_keys,
+            "fresh_keys": fresh,
+            "refreshed": refreshed,
+            "failed": failed,
+            "skipped_over_budget": skipped,
+            "budget": budget,
+            "budget_used": (refreshed + failed) / budget,
+            "coverage": (fresh + refreshed) / hot_keys if hot_keys else 1.0,
+        }
+        logger.info("Refresh cycle finished: %s", self.last_cycle)
+
+    async def find_candidates(self, endpoint, cache_keys):
+        """
+        Split hot keys into the ones still fresh and the ones expiring within the refresh window. Only the
+        'created_at' of the stored documents is read, not their data.
+
+        Returns:
+            tuple: The (cache_key, params) candidates in popularity order, and the number of fresh keys.
+        """
+        raw_params = await mget(self.redis, [access_params_key(cache_key) for cache_key in cache_keys])
+        created_at = await get_storage().get_created_at(endpoint, cache_keys)
+
+        now = datetime.now(timezone(timedelta(hours=timezone_offset_hours)))
+        candidates = []
+        fresh = 0
+        for cache_key, raw in zip(cache_keys, raw_params):
+            if not raw:
+                continue  # Params forgotten, the key cannot be fetched again
+            entry = json.loads(raw)
+            lifetime = timedelta(hours=entry["expire_hours"])
+            if cache_key not in created_at:
+                continue  # Never stored or negatively cached, nothing to keep warm
+
+            if created_at[cache_key]:
+                expires_at = datetime.fromisoformat(created_at[cache_key]) + lifetime
+                if expires_at - now > lifetime * REFRESH_AHEAD_FRACTION:
+                    fresh += 1
+                    continue
+
+            candidates.append((cache_key, entry["params"]))
+
+        return candidates, fresh
+
+    async def decay(self):
+        """
+        Halve all access counts and drop the least accessed keys, so popularity follows recent traffic.
+        """
+        for endpoint in CACHE_COLLECTIONS:
+            key = access_counts_key(endpoint)
+            await self.redis.zunionstore(key, {key: 0.5})
+            await self.redis.zremrangebyrank(key, 0, -(ACCESS_MAX_TRACKED + 1))
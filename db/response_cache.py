@@ -0,0 +1,272 @@
+import asyncio
+import base64
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+
+from components.custom_logger import get_logger
+from components.fields import fields_variant
+from components.http_cache import RESPONSE_ENCODINGS, accepted_encodings, compress_body, is_not_modified, make_etag
+from components.metrics import increment
+from db.access_tracker import AccessTracker
+from db.cache_keys import build_cache_key, normalize_params, response_cache_key
+from db.cache_writer import CacheWriter
+from db.rapidapi_client import env_expire_hours, get_data_or_cache, get_many_data_or_cache, timezone_offset_hours
+from db.storage import get_storage
+
+load_dotenv()
+
+logger = get_logger("response_cache")
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", 1024))  # Smaller bodies are only stored uncompressed, 0 disables
+
+# Return the etag and created_at of a cached response and the first of the ARGV fields it holds, with the
+# field's value unless ARGV[1] is '0'. The client's preferred body variant is read without the others.
+RESPONSE_LOOKUP_LUA_SCRIPT = """
+local meta = redis.call('HMGET', KEYS[1], 'etag', 'created_at')
+if not meta[1] then
+    return false
+end
+
+for index = 2, #ARGV do
+    if redis.call('HEXISTS', KEYS[1], ARGV[index]) == 1 then
+        if ARGV[1] == '0' then
+            return {meta[1], meta[2], ARGV[index]}
+        end
+        return {meta[1], meta[2], ARGV[index], redis.call('HGET', KEYS[1], ARGV[index])}
+    end
+end
+return false
+"""
+
+
+async def lookup_created_at(endpoint, cache_keys):
+    """
+    Return the 'created_at' of the stored documents of the cache keys, for the Last-Modified header. Data that
+    is still waiting in the CacheWriter, or is not stored at all, has just been fetched.
+    """
+    now = datetime.now(timezone(timedelta(hours=timezone_offset_hours))).isoformat()
+    cache_writer = CacheWriter.get_instance()
+    stored_keys = [cache_key for cache_key in cache_keys if cache_writer.get_pending(cache_key) is None]
+    stored = {}
+    if stored_keys:
+        try:
+            stored = await get_storage().get_created_at(endpoint, stored_keys)
+        except Exception as e:
+            logger.warning(f"Looking up created_at of {len(stored_keys)} {endpoint} documents failed: {str(e)}")
+    return [stored.get(cache_key) or now for cache_key in cache_keys]
+
+
+async def render_entries(endpoint, cache_keys, data, render):
+    """
+    Render the data of cache keys into response cache entries: the body, its ETag and the 'created_at' of the
+    data.
+    """
+    bodies = await asyncio.gather(*[render(item) for item in data])
+    created_at = await lookup_created_at(endpoint, cache_keys)
+    return [{"body": body, "etag": make_etag(body), "created_at": created}
+            for body, created in zip(bodies, created_at)]
+
+
+def encode_entry(entry):
+    """
+    Return the Redis hash of a response cache entry, with a compressed copy of bodies of at least
+    RESPONSE_COMPRESS_MIN_BYTES per encoding. The Redis client decodes responses as text, so the compressed
+    copies are stored base64 encoded.
+    """
+    mapping = dict(entry)
+    body = entry["body"].encode("utf-8") if isinstance(entry["body"], str) else entry["body"]
+    if RESPONSE_COMPRESS_MIN_BYTES and len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+        for encoding in RESPONSE_ENCODINGS:
+            mapping[encoding] = base64.b64encode(compress_body(body, encoding)).decode("ascii")
+    return mapping
+
+
+def select_encoding(mapping, headers):
+    """
+    Return the entry of a response cache hash with the body in the best encoding the client accepts.
+    """
+    entry = {"etag": mapping.get("etag"), "created_at": mapping.get("created_at"), "body": mapping.get("body")}
+    for encoding in accepted_encodings(headers):
+        if encoding in mapping:
+            entry.update(body=base64.b64decode(mapping[encoding]), encoding=encoding)
+            break
+    return entry
+
+
+async def lookup_response(redis: Redis, body_key, headers=None):
+    """
+    Look up a cached response in the best encoding the client accepts, with one Redis call.
+
+    Returns:
+        dict: The 'body', 'etag', 'created_at' and 'encoding' of the response, without 'body' when the
+            request headers hold a matching If-None-Match or If-Modified-Since, or None when it is not cached.
+    """
+    fields = [*accepted_encodings(headers), "body"]
+
+    # Conditional requests only need the ETag and created_at of the cached body
+    if headers is not None and (headers.get("if-none-match") or headers.get("if-modified-since")):
+        result = await redis.eval(RESPONSE_LOOKUP_LUA_SCRIPT, 1, body_key, "0", *fields)
+        if result and is_not_modified(headers, result[0], result[1]):
+            return {"etag": result[0], "created_at": result[1], "encoding": None if result[2] == "body" else result[2]}
+
+    result = await redis.eval(RESPONSE_LOOKUP_LUA_SCRIPT, 1, body_key, "1", *fields)
+    if not result:
+        return None
+    etag, created_at, field, body = result
+    if field == "body":
+        return {"etag": etag, "created_at": created_at, "body": body}
+    return {"etag": etag, "created_at": created_at, "body": base64.b64decode(body), "encoding": field}
+
+
+async def store_response(redis: Redis, body_key, entry, expire_seconds, headers=None):
+    """
+    Store a rendered response with its compressed copies for expire_seconds.
+
+    Returns:
+        dict: The entry with the body in the best encoding the client accepts.
+    """
+    if RESPONSE_COMPRESS_MIN_BYTES and len(entry["body"]) >= RESPONSE_COMPRESS_MIN_BYTES:
+        # Compressing a large body takes milliseconds, zlib and brotli release the GIL meanwhile
+        mapping = await asyncio.to_thread(encode_entry, entry)
+    else:
+        mapping = encode_entry(entry)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(body_key)
+        pipe.hset(body_key, mapping=mapping)
+        pipe.expire(body_key, expire_seconds)
+        await pipe.execute()
+    return select_encoding(mapping, headers)
+
+
+async def get_response_or_render(endpoint, params, expire_seconds, redis: Redis, render,
+                                 expire_hours: int = env_expire_hours, fields=None, headers=None):
+    """
+    Return the JSON response body of a route for the data of an API request, with its ETag and the
+    'created_at' of the data, see components/http_cache.py.
+
+    The body is rendered once from the cached data, i.e. validated and serialized, and stored in a Redis hash
+    next to the data for expire_seconds, together with its compressed copies. Cache hits return the stored
+    body in the encoding the client accepts, without decoding, validating or compressing it again. The stored body is dropped whenever the CacheWriter writes new data for the key;
+    bodies limited to some fields are kept per field selection and only expire.
+
+    Args:
+        endpoint (str): The API endpoint of the data.
+        params (dict): The query parameters of the API request.
+        expire_seconds (int): The expiration time of the rendered body in Redis, in seconds.
+        redis (Redis): The Redis client instance.
+        render (Callable): Coroutine function turning the raw JSON text or decoded data into the body bytes.
+        expire_hours (int): The number of hours stored documents stay valid.
+        fields (dict): Field tree the render limits the body to, pushed down into the storage lookup and
+            part of the Redis key of the body.
+        headers (Mapping): The request headers. When they hold a matching If-None-Match or If-Modified-Since,
+            the cached body is not loaded and the entry is returned without it. Their Accept-Encoding selects
+            the encoding of the body.
+
+    Returns:
+        dict: The 'body', 'etag', 'created_at' and 'encoding' of the response, without 'body' when the client
+            holds it.
+    """
+    params = normalize_params(endpoint, params)
+    cache_key = build_cache_key(endpoint, params)
+
+    if not RESPONSE_CACHE_ENABLED:
+        data = await get_data_or_cache(endpoint, params, expire_seconds, redis, expire_hours, raw=True, fields=fields)
+        return (await render_entries(endpoint, [cache_key], [data], render))[0]
+
+    body_key = response_cache_key(cache_key, fields_variant(fields) if fields else None)
+
+    entry = await lookup_response(redis, body_key, headers)
+    if entry:
+        AccessTracker.get_instance().record(endpoint, cache_key, params, expire_hours)
+        increment("cache_requests_total", endpoint=endpoint, tier="response" if "body" in entry else "not_modified")
+        return entry
+
+    data = await get_data_or_cache(endpoint, params, expire_seconds, redis, expire_hours, raw=True, fields=fields)
+    entry = (await render_entries(endpoint, [cache_key], [data], render))[0]
+    return await store_response(redis, body_key, entry, expire_seconds, headers)
+
+
+async def get_many_responses_or_render(endpoint, params_list, expire_seconds, redis: Redis, render,
+                                       expire_hours: int = env_expire_hours):
+    """
+    Batch version of get_response_or_render: all rendered bodies are looked up in one pipeline and only the
+    misses are resolved with get_many_data_or_cache. The bodies are returned uncompressed, for the caller to
+    combine.
+
+    Returns:
+        list: The response cache entry for each params dict, in the same order as params_list.
+    """
+    params_list = [normalize_params(endpoint, params) for params in params_list]
+    cache_keys = [build_cache_key(endpoint, params) for params in params_list]
+
+    if not RESPONSE_CACHE_ENABLED or not params_list:
+        data = await get_many_data_or_cache(endpoint, params_list, expire_seconds, redis, expire_hours, raw=True)
+        return await render_entries(endpoint, cache_keys, data, render)
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for cache_key in cache_keys:
+            pipe.hmget(response_cache_key(cache_key), "body", "etag", "created_at")
+        entries = [dict(zip(("body", "etag", "created_at"), values)) for values in await pipe.execute()]
+
+    missing = [index for index, entry in enumerate(entries) if entry.get("body") is None]
+    access_tracker = AccessTracker.get_instance()
+    for index, (params, cache_key) in enumerate(zip(params_list, cache_keys)):
+        if entries[index].get("body") is not None:
+            access_tracker.record(endpoint, cache_key, params, expire_hours)
+    increment("cache_requests_total", len(params_list) - len(missing), endpoint=endpoint, tier="response")
+    if not missing:
+        return entries
+
+    data = await get_many_data_or_cache(endpoint, [params_list[index] for index in missing], expire_seconds, redis,
+                                        expire_hours, raw=True)
+    rendered = await render_entries(endpoint, [cache_keys[index] for index in missing], data, render)
+    if RESPONSE_COMPRESS_MIN_BYTES and any(len(entry["body"]) >= RESPONSE_COMPRESS_MIN_BYTES for entry in rendered):
+        # Compress the whole batch in one thread, as store_response does for a single large body
+        mappings = await asyncio.to_thread(lambda: [encode_entry(entry) for entry in rendered])
+    else:
+        mappings = [encode_entry(entry) for entry in rendered]
+    async with redis.pipeline(transaction=False) as pipe:
+        for index, entry, mapping in zip(missing, rendered, mappings):
+            entries[index] = entry
+            pipe.delete(response_cache_key(cache_keys[index]))
+            pipe.hset(response_cache_key(cache_keys[index]), mapping=mapping)
+            pipe.expire(response_cache_key(cache_keys[index]), expire_seconds)
+        await pipe.execute()
+    return entries
+
+
+async def get_composed_response_or_render(name, params, expire_seconds, redis: Redis, render, headers=None):
+    """
+    Return the JSON response body of a route composed from several API responses, e.g. /detailed_hotel,
+    rendered once and then cached like the bodies of get_response_or_render. As it is not tied to one cache
+    key, the body is not dropped when new data is written and is kept for expire_seconds only.
+
+    Args:
+        name (str): The name of the route, the prefix of its Redis key.
+        params (dict): The query parameters of the route.
+        expire_seconds (int): The expiration time of the rendered body in Redis, in seconds.
+        redis (Redis): The Redis client instance.
+        render (Callable): Coroutine function without arguments returning the body bytes.
+        headers (Mapping): The request headers, see get_response_or_render.
+
+    Returns:
+        dict: The 'body', 'etag', 'created_at' and 'encoding' of the response, without 'body' when the client
+            holds it.
+    """
+    now = datetime.now(timezone(timedelta(hours=timezone_offset_hours))).isoformat()
+    if not RESPONSE_CACHE_ENABLED:
+        body = await render()
+        return {"body": body, "etag": make_etag(body), "created_at": now}
+
+    body_key = response_cache_key(build_cache_key(name, params))
+    entry = await lookup_response(redis, body_key, headers)
+    if entry:
+        increment("cache_requests_total", endpoint=name, tier="response" if "body" in entry else "not_modified")
+        return entry
+
+    body = await render()
+    return await store_response(redis, body_key, {"body": body, "etag": make_etag(body), "created_at": now},
+                                expire_seconds, headers)
@@ -0,0 +1,166 @@
+"""
+Local filtering and sorting of hotel reviews.
+
+Instead of one API call and one cached copy per customer_type, language_filter and sort_type combination,
+the unfiltered reviews of a hotel are fetched page by page and kept once, in upstream order, in a review
+index in Redis. The index lists the positions of the reviews per customer type and per language, so every
+filter combination is answered from it, and only pages that are not in the index yet are fetched.
+"""
+import asyncio
+import json
+import os
+import weakref
+
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+
+from components.custom_logger import get_logger
+from db.cache_keys import build_cache_key
+from db.cache_payload import decode_payload, encode_payload
+from db.rapidapi_client import env_expire_hours
+from db.review_stats import REVIEWS_PER_PAGE, fetch_review_pages, review_key
+
+load_dotenv()
+
+logger = get_logger("review_index")
+REVIEWS_LOCAL_FILTER_ENABLED = os.getenv("REVIEWS_LOCAL_FILTER_ENABLED", "false").lower() == "true"
+REVIEWS_LOCAL_MAX_PAGES = int(os.getenv("REVIEWS_LOCAL_MAX_PAGES", 20))  # Unfiltered pages kept per hotel
+REVIEWS_LOCAL_BATCH_PAGES = int(os.getenv("REVIEWS_LOCAL_BATCH_PAGES", 4))  # Unfiltered pages fetched concurrently
+UNFILTERED_SORT_TYPE = "SORT_MOST_RELEVANT"
+
+# sort_type -> (review field, descending) of the sorts applied locally, None keeps the upstream order
+LOCAL_SORTS = {
+    "SORT_MOST_RELEVANT": None,
+    "SORT_RECENT_DESC": ("date", True),
+    "SORT_RECENT_ASC": ("date", False),
+    "SORT_SCORE_DESC": ("average_score", True),
+    "SORT_SCORE_ASC": ("average_score", False),
+}
+
+_index_locks = weakref.WeakValueDictionary()  # index key -> lock held while the index is extended
+
+
+def split_values(value):
+    return [item.strip().lower() for item in (value or "").split(",") if item.strip()]
+
+
+def customer_type_of(review):
+    author = review.get("author") or {}
+    return (author.get("type") or "").lower()
+
+
+def language_of(review):
+    return (review.get("languagecode") or "").lower()
+
+
+def new_index():
+    return {"pages": 0, "complete": False, "reviews": [], "customer_type": {}, "language": {}}
+
+
+def add_reviews(index, reviews, known_keys):
+    """
+    Append the reviews of an unfiltered page to the index, skipping reviews it already holds.
+    """
+    for review in reviews:
+        key = review_key(review)
+        if key in known_keys:
+            continue
+        known_keys.add(key)
+        position = len(index["reviews"])
+        index["reviews"].append(review)
+        index["customer_type"].setdefault(customer_type_of(review), []).append(position)
+        index["language"].setdefault(language_of(review), []).append(position)
+
+
+def match_positions(index, customer_types, languages):
+    """
+    Return the positions of the reviews matching the filters, in upstream order. An empty filter matches all.
+    """
+    positions = None
+    if customer_types:
+        positions = set().union(*(index["customer_type"].get(value, []) for value in customer_types))
+    if languages:
+        language_positions = set().union(*(index["language"].get(value, []) for value in languages))
+        positions = language_positions if positions is None else positions & language_positions
+    return range(len(index["reviews"])) if positions is None else sorted(positions)
+
+
+def sort_reviews(reviews, sort_type):
+    sort = LOCAL_SORTS[sort_type]
+    if sort is None:
+        return reviews
+    field, descending = sort
+    # Reviews without the field go last in both directions
+    present = [review for review in reviews if review.get(field) is not None]
+    missing = [review for review in reviews if review.get(field) is None]
+    return sorted(present, key=lambda review: review[field], reverse=descending) + missing
+
+
+async def load_index(redis: Redis, index_key):
+    value = await redis.get(index_key)
+    return json.loads(decode_payload(value)) if value else None
+
+
+async def get_local_reviews(params, expire_seconds, redis: Redis, expire_hours: int = env_expire_hours):
+    """
+    Return a page of filtered and sorted reviews from the review index of the hotel, extending the index
+    with the unfiltered pages it still needs first.
+
+    Sorts other than the upstream order need every review of the hotel, and a relevance page needs enough
+    matching reviews. When the index can't hold them within REVIEWS_LOCAL_MAX_PAGES, or the sort_type is
+    not one of LOCAL_SORTS, None is returned and the caller asks the API for the filtered page instead.
+
+    Args:
+        params (dict): The reviews API params, including the filters, sort_type and page_number.
+        expire_seconds (int): The expiration time of the unfiltered pages in Redis, in seconds.
+        redis (Redis): The Redis client instance.
+        expire_hours (int): The number of hours the unfiltered pages and the index stay valid.
+
+    Returns:
+        list: The reviews of the requested page, or None.
+    """
+    sort_type = params.get('sort_type') or UNFILTERED_SORT_TYPE
+    if sort_type not in LOCAL_SORTS:
+        return None
+    needs_all = LOCAL_SORTS[sort_type] is not None
+    customer_types = split_values(params.get('customer_type'))
+    languages = split_values(params.get('language_filter'))
+    page_number = int(params.get('page_number') or 0)
+    needed = (page_number + 1) * REVIEWS_PER_PAGE
+
+    unfiltered = {'hotel_id': params['hotel_id'], 'locale': params.get('locale'), 'sort_type': UNFILTERED_SORT_TYPE}
+    index_key = build_cache_key("review-index", unfiltered)
+    lock = _index_locks.get(index_key)
+    if lock is None:
+        lock = _index_locks[index_key] = asyncio.Lock()
+
+    async with lock:
+        index = await load_index(redis, index_key) or new_index()
+        known_keys = {review_key(review) for review in index["reviews"]}
+        extended = False
+
+        while (not index["complete"] and index["pages"] < REVIEWS_LOCAL_MAX_PAGES
+               and (needs_all or len(match_positions(index, customer_types, languages)) < needed)):
+            page_numbers = list(range(index["pages"], min(index["pages"] + REVIEWS_LOCAL_BATCH_PAGES,
+                                                           REVIEWS_LOCAL_MAX_PAGES)))
+            for reviews in await fetch_review_pages(unfiltered, page_numbers, expire_seconds, redis, expire_hours):
+                add_reviews(index, reviews, known_keys)
+                index["pages"] += 1
+                # A page that is not full is the last one
+                if len(reviews) < REVIEWS_PER_PAGE:
+                    index["complete"] = True
+                    break
+            extended = True
+
+        if extended:
+            value = encode_payload(json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            await redis.set(index_key, value, ex=int(expire_hours * 3600))
+            logger.info("Review index %s holds %d reviews from %d pages", index_key, len(index["reviews"]),
+                        index["pages"])
+
+    positions = match_positions(index, customer_types, languages)
+    if not index["complete"] and (needs_all or len(positions) < needed):
+        return None
+
+    reviews = sort_reviews([index["reviews"][position] for position in positions], sort_type)
+    return reviews[page_number * REVIEWS_PER_PAGE:needed]
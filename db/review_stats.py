@@ -0,0 +1,186 @@
+"""
+Multi-page review fetches and review statistics.
+
+Pages of reviews are fetched concurrently through the cache, and the page after the last one is prefetched
+in the background. The statistics of a hotel's reviews are kept in the storage backend and updated
+incrementally: only pages whose reviews changed since they were last counted are added, and every review is
+counted once, however many pages it shows up on.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import weakref
+
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+
+from components.custom_logger import get_logger
+from db.cache_keys import build_cache_key
+from db.rapidapi_client import env_expire_hours, get_data_or_cache, get_many_data_or_cache
+from db.storage import get_storage
+
+load_dotenv()
+
+logger = get_logger("review_stats")
+REVIEWS_PER_PAGE = int(os.getenv("REVIEWS_PER_PAGE", 25))  # Page size of the reviews API
+REVIEWS_AGGREGATE_MAX_PAGES = int(os.getenv("REVIEWS_AGGREGATE_MAX_PAGES", 10))  # Pages one aggregate request may fetch
+REVIEWS_PREFETCH_ENABLED = os.getenv("REVIEWS_PREFETCH_ENABLED", "true").lower() == "true"
+REVIEW_STATS_COLLECTION = "review-stats"
+
+_prefetches = {}  # cache key -> task fetching the page in the background
+_stats_locks = weakref.WeakValueDictionary()  # stats key -> lock held while the stats are updated
+
+
+def page_reviews(page):
+    """
+    Return the list of reviews of a reviews API response.
+    """
+    if isinstance(page, dict):
+        return page.get("result") or []
+    return page if isinstance(page, list) else []
+
+
+def review_key(review):
+    """
+    Return the identity of a review, its review_id or a hash of the review if it has none.
+    """
+    if review.get("review_id") is not None:
+        return str(review["review_id"])
+    return hashlib.sha1(json.dumps(review, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def page_fingerprint(reviews):
+    """
+    Return a hash of the reviews on a page, which changes when reviews are added to or moved off the page.
+    """
+    return hashlib.sha1(",".join(review_key(review) for review in reviews).encode("utf-8")).hexdigest()
+
+
+async def fetch_review_pages(params, page_numbers, expire_seconds, redis: Redis, expire_hours: int = env_expire_hours):
+    """
+    Fetch pages of reviews concurrently, each page through the cache and the shared rate limit.
+
+    Args:
+        params (dict): The reviews API params without page_number.
+        page_numbers (list): The pages to fetch.
+        expire_seconds (int): The expiration time of the pages in Redis, in seconds.
+        redis (Redis): The Redis client instance.
+        expire_hours (int): The number of hours stored pages stay valid.
+
+    Returns:
+        list: The reviews of each page, in the order of page_numbers.
+    """
+    params_list = [{**params, 'page_number': page_number} for page_number in page_numbers]
+    pages = await get_many_data_or_cache("reviews", params_list, expire_seconds, redis, expire_hours)
+    return [page_reviews(page) for page in pages]
+
+
+def prefetch_review_page(params, page_number, expire_seconds, redis: Redis, expire_hours: int = env_expire_hours):
+    """
+    Start fetching a page of reviews in the background, so a client asking for it next finds it cached.
+    A page that is already being prefetched is not fetched twice.
+    """
+    if not REVIEWS_PREFETCH_ENABLED:
+        return
+    page_params = {**params, 'page_number': page_number}
+    cache_key = build_cache_key("reviews", page_params)
+    if cache_key in _prefetches:
+        return
+
+    task = asyncio.create_task(get_data_or_cache("reviews", page_params, expire_seconds, redis, expire_hours))
+    _prefetches[cache_key] = task
+
+    def done(finished):
+        _prefetches.pop(cache_key, None)
+        if not finished.cancelled() and finished.exception() is not None:
+            logger.info("Prefetching reviews page %s failed: %s", cache_key, finished.exception())
+
+    task.add_done_callback(done)
+
+
+def empty_stats():
+    return {"reviews": 0, "scored": 0, "score_sum": 0.0, "score_histogram": {}, "travel_purpose": {}, "language": {}}
+
+
+def add_review(stats, review):
+    """
+    Count one review in the statistics.
+    """
+    stats["reviews"] += 1
+    score = review.get("average_score")
+    if isinstance(score, (int, float)):
+        stats["scored"] += 1
+        stats["score_sum"] += score
+        bucket = str(min(10, max(0, math.floor(score))))
+        stats["score_histogram"][bucket] = stats["score_histogram"].get(bucket, 0) + 1
+    for field, name in (("travel_purpose", "travel_purpose"), ("languagecode", "language")):
+        value = review.get(field) or "unknown"
+        stats[name][value] = stats[name].get(value, 0) + 1
+
+
+def format_stats(stats):
+    """
+    Return the statistics as reported to clients, with the average score instead of the running sums.
+    """
+    return {
+        "reviews": stats["reviews"],
+        "average_score": round(stats["score_sum"] / stats["scored"], 2) if stats["scored"] else None,
+        "score_histogram": dict(sorted(stats["score_histogram"].items(), key=lambda item: int(item[0]))),
+        "travel_purpose": dict(sorted(stats["travel_purpose"].items())),
+        "language": dict(sorted(stats["language"].items())),
+    }
+
+
+async def update_review_stats(params, pages):
+    """
+    Add the reviews of new or changed pages to the stored statistics of a hotel's reviews.
+
+    The stored document remembers the fingerprint of every counted page and the keys of the counted reviews,
+    so pages that did not change since they were counted cost no storage write.
+
+    Args:
+        params (dict): The reviews API params without page_number, identifying the statistics.
+        pages (dict): The reviews of each fetched page, keyed by page number.
+
+    Returns:
+        dict: The statistics, see format_stats.
+    """
+    stats_key = build_cache_key(REVIEW_STATS_COLLECTION, params)
+    lock = _stats_locks.get(stats_key)
+    if lock is None:
+        lock = _stats_locks[stats_key] = asyncio.Lock()
+
+    async with lock:
+        storage = get_storage()
+        document = await storage.get(REVIEW_STATS_COLLECTION, stats_key) or {
+            "cache_key": stats_key, "pages": {}, "review_keys": [], "stats": empty_stats()
+        }
+        fingerprints = {str(page_number): page_fingerprint(reviews) for page_number, reviews in pages.items()}
+        changed = [page_number for page_number, fingerprint in fingerprints.items()
+                   if document["pages"].get(page_number) != fingerprint]
+        if not changed:
+            return format_stats(document["stats"])
+
+        counted = set(document["review_keys"])
+        for page_number in changed:
+            for review in pages[int(page_number)]:
+                key = review_key(review)
+                if key not in counted:
+                    counted.add(key)
+                    add_review(document["stats"], review)
+            document["pages"][page_number] = fingerprints[page_number]
+        document["review_keys"] = sorted(counted)
+        document.pop("_id", None)
+
+        await storage.put_many(REVIEW_STATS_COLLECTION, [document])
+        logger.info("Review statistics %s updated from %d new pages", stats_key, len(changed))
+        return format_stats(document["stats"])
+
+
+async def ensure_review_indexes():
+    """
+    Create the index on the 'cache_key' field of the statistics collection.
+    """
+    await get_storage().ensure_indexes([REVIEW_STATS_COLLECTION])
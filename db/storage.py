@@ -0,0 +1,347 @@
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import threading
+
+from dotenv import load_dotenv
+from pymongo import InsertOne, ReplaceOne
+
+from components.custom_logger import get_logger
+from components.fields import field_paths, project
+from db.cache_keys import build_cache_key
+
+load_dotenv()
+
+logger = get_logger("storage")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")  # mongo, sqlite or memory
+SQLITE_PATH = os.getenv("SQLITE_PATH", "cache.db")  # Database file of the sqlite backend
+
+
+class StorageBackend:
+    """
+    Persistent document store behind the Redis cache.
+
+    Documents are dicts identified by their 'cache_key' field within a collection. Every backend supports the
+    same single and bulk operations, so freshness checks and batching work the same way on all of them.
+    """
+
+    async def get(self, collection, cache_key, fields=None):
+        """
+        Return the document stored under a cache key, or None. With a field tree from components/fields.py
+        only those fields of its 'data' are returned, next to the top-level 'cache_key' and 'created_at'.
+        """
+        raise NotImplementedError
+
+    async def get_many(self, collection, cache_keys):
+        """
+        Return the documents stored under the cache keys, as a dict keyed by cache key. Missing keys are left out.
+        """
+        raise NotImplementedError
+
+    async def get_created_at(self, collection, cache_keys):
+        """
+        Return the 'created_at' of the documents stored under the cache keys without loading their data, as a
+        dict keyed by cache key. Missing keys are left out.
+        """
+        raise NotImplementedError
+
+    async def put_many(self, collection, documents, replace: bool = True):
+        """
+        Store documents under their cache keys. With replace=False the collection is assumed to hold none of
+        them yet, which lets backends use a faster plain insert.
+        """
+        raise NotImplementedError
+
+    async def delete_many(self, collection, cache_keys):
+        """
+        Delete the documents stored under the cache keys.
+        """
+        raise NotImplementedError
+
+    def find(self, collection, query=None):
+        """
+        Async iterator over every document whose top-level fields equal the values in query, or over all
+        documents without one.
+        """
+        raise NotImplementedError
+
+    async def clear(self, collection):
+        """
+        Delete every document of a collection.
+        """
+        raise NotImplementedError
+
+    async def ensure_indexes(self, collections):
+        """
+        Prepare the lookup on 'cache_key' for the collections.
+        """
+
+    async def migrate_legacy_documents(self, collections):
+        """
+        Give documents stored before lookups used 'cache_key' their cache key, so they stay reachable.
+        Only MongoDB can hold such documents.
+        """
+
+    async def close(self):
+        pass
+
+
+class MongoStorage(StorageBackend):
+    """
+    MongoDB backend using the Motor client from db/mdb_client.py.
+    """
+
+    def __init__(self):
+        # Imported here, so the other backends run without MongoDB and its MDB_* settings
+        from db.mdb_client import booking_db
+        self.db = booking_db
+
+    async def get(self, collection, cache_key, fields=None):
+        projection = None
+        if fields:
+            # Let MongoDB drop the unselected fields, so they are never transferred or decoded
+            projection = {f"data.{path}": 1 for path in field_paths(fields)}
+            projection.update(cache_key=1, created_at=1)
+        return await self.db[collection].find_one({"cache_key": cache_key}, projection)
+
+    async def get_many(self, collection, cache_keys):
+        documents = {}
+        async for document in self.db[collection].find({"cache_key": {"$in": list(set(cache_keys))}}):
+            documents[document["cache_key"]] = document
+        return documents
+
+    async def get_created_at(self, collection, cache_keys):
+        created_at = {}
+        async for document in self.db[collection].find({"cache_key": {"$in": list(set(cache_keys))}},
+                                                        {"_id": 0, "cache_key": 1, "created_at": 1}):
+            created_at[document["cache_key"]] = document.get("created_at")
+        return created_at
+
+    async def put_many(self, collection, documents, replace: bool = True):
+        if not documents:
+            return
+        if not replace:
+            await self.db[collection].insert_many(documents, ordered=False)
+            return
+        await self.db[collection].bulk_write([
+            ReplaceOne({"cache_key": document["cache_key"]}, document, upsert=True) if document.get("cache_key")
+            else InsertOne(document)
+            for document in documents
+        ], ordered=False)
+
+    async def delete_many(self, collection, cache_keys):
+        await self.db[collection].delete_many({"cache_key": {"$in": list(set(cache_keys))}})
+
+    async def find(self, collection, query=None):
+        async for document in self.db[collection].find(query or {}, {"_id": 0}):
+            yield document
+
+    async def clear(self, collection):
+        await self.db[collection].delete_many({})
+
+    async def ensure_indexes(self, collections):
+        for collection in collections:
+            await self.db[collection].create_index("cache_key")
+
+    async def migrate_legacy_documents(self, collections, batch_size: int = 1000):
+        # Legacy documents are {**params, data, created_at}, matched on their params. Their cache key is built
+        # from the stored params and set in place, without reading 'data'. When several legacy documents map to
+        # the same canonical key, or a document under the key exists already, the newest one is kept.
+        for collection in collections:
+            stamped = deleted = 0
+            while True:
+                legacy = await self.db[collection].find({"cache_key": {"$exists": False}},
+                                                        {"data": 0}).to_list(batch_size)
+                if not legacy:
+                    break
+                for document in legacy:
+                    params = {name: value for name, value in document.items() if name not in ("_id", "created_at")}
+                    cache_key = build_cache_key(collection, params)
+                    current = await self.db[collection].find_one({"cache_key": cache_key}, {"_id": 1, "created_at": 1})
+                    if current is not None and (current.get("created_at") or "") >= (document.get("created_at") or ""):
+                        await self.db[collection].delete_one({"_id": document["_id"]})
+                        deleted += 1
+                        continue
+                    await self.db[collection].update_one({"_id": document["_id"]}, {"$set": {"cache_key": cache_key}})
+                    stamped += 1
+                    if current is not None:
+                        await self.db[collection].delete_one({"_id": current["_id"]})
+                        deleted += 1
+            if stamped or deleted:
+                logger.info("Migrated legacy %s documents: %d given a cache key, %d older duplicates deleted",
+                            collection, stamped, deleted)
+
+    async def close(self):
+        self.db.client.close()
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Embedded on-disk backend for single-node deployments. Documents are stored as JSON in one SQLite table and
+    queries run in a worker thread, so the event loop is never blocked on disk I/O.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "collection TEXT NOT NULL, cache_key TEXT NOT NULL, document TEXT NOT NULL, "
+                "PRIMARY KEY (collection, cache_key))"
+            )
+            self.connection.commit()
+
+    def _execute(self, sql, parameters=(), many=False):
+        with self.lock:
+            if many:
+                self.connection.executemany(sql, parameters)
+                self.connection.commit()
+                return []
+            rows = self.connection.execute(sql, parameters).fetchall()
+            self.connection.commit()
+            return rows
+
+    async def run(self, sql, parameters=(), many=False):
+        return await asyncio.to_thread(self._execute, sql, parameters, many)
+
+    async def get(self, collection, cache_key, fields=None):
+        rows = await self.run("SELECT document FROM documents WHERE collection = ? AND cache_key = ?",
+                              (collection, cache_key))
+        return project_document(json.loads(rows[0][0]), fields) if rows else None
+
+    async def get_many(self, collection, cache_keys):
+        cache_keys = list(set(cache_keys))
+        documents = {}
+        # Stay below SQLite's limit on bound parameters per statement
+        for start in range(0, len(cache_keys), 500):
+            chunk = cache_keys[start:start + 500]
+            rows = await self.run(
+                f"SELECT cache_key, document FROM documents WHERE collection = ? "
+                f"AND cache_key IN ({','.join('?' * len(chunk))})",
+                (collection, *chunk)
+            )
+            documents.update((cache_key, json.loads(document)) for cache_key, document in rows)
+        return documents
+
+    async def get_created_at(self, collection, cache_keys):
+        cache_keys = list(set(cache_keys))
+        created_at = {}
+        for start in range(0, len(cache_keys), 500):
+            chunk = cache_keys[start:start + 500]
+            rows = await self.run(
+                f"SELECT cache_key, json_extract(document, '$.created_at') FROM documents WHERE collection = ? "
+                f"AND cache_key IN ({','.join('?' * len(chunk))})",
+                (collection, *chunk)
+            )
+            created_at.update(rows)
+        return created_at
+
+    async def put_many(self, collection, documents, replace: bool = True):
+        rows = [(collection, document["cache_key"], json.dumps(document, default=str))
+                for document in documents if document.get("cache_key")]
+        if rows:
+            await self.run("INSERT OR REPLACE INTO documents (collection, cache_key, document) VALUES (?, ?, ?)",
+                           rows, many=True)
+
+    async def delete_many(self, collection, cache_keys):
+        cache_keys = list(set(cache_keys))
+        for start in range(0, len(cache_keys), 500):
+            chunk = cache_keys[start:start + 500]
+            await self.run(f"DELETE FROM documents WHERE collection = ? AND cache_key IN ({','.join('?' * len(chunk))})",
+                           (collection, *chunk))
+
+    async def find(self, collection, query=None):
+        conditions = "".join(f" AND json_extract(document, '$.{field}') = ?" for field in (query or {}))
+        rows = await self.run(f"SELECT document FROM documents WHERE collection = ?{conditions}",
+                              (collection, *(query or {}).values()))
+        for (document,) in rows:
+            yield json.loads(document)
+
+    async def clear(self, collection):
+        await self.run("DELETE FROM documents WHERE collection = ?", (collection,))
+
+    async def close(self):
+        await asyncio.to_thread(self.connection.close)
+
+
+class MemoryStorage(StorageBackend):
+    """
+    In-process backend for tests and benchmarks. Nothing is persisted.
+    """
+
+    def __init__(self):
+        self.collections = {}
+
+    async def get(self, collection, cache_key, fields=None):
+        document = self.collections.get(collection, {}).get(cache_key)
+        return project_document(copy.copy(document), fields) if document is not None else None
+
+    async def get_many(self, collection, cache_keys):
+        stored = self.collections.get(collection, {})
+        return {cache_key: copy.copy(stored[cache_key]) for cache_key in cache_keys if cache_key in stored}
+
+    async def get_created_at(self, collection, cache_keys):
+        stored = self.collections.get(collection, {})
+        return {cache_key: stored[cache_key].get("created_at") for cache_key in cache_keys if cache_key in stored}
+
+    async def put_many(self, collection, documents, replace: bool = True):
+        stored = self.collections.setdefault(collection, {})
+        for document in documents:
+            if document.get("cache_key"):
+                stored[document["cache_key"]] = copy.copy(document)
+
+    async def delete_many(self, collection, cache_keys):
+        stored = self.collections.get(collection, {})
+        for cache_key in cache_keys:
+            stored.pop(cache_key, None)
+
+    async def find(self, collection, query=None):
+        for document in list(self.collections.get(collection, {}).values()):
+            if all(document.get(field) == value for field, value in (query or {}).items()):
+                yield copy.copy(document)
+
+    async def clear(self, collection):
+        self.collections.pop(collection, None)
+
+
+def project_document(document, fields):
+    """
+    Apply a field tree to the 'data' of a document, for the backends that cannot project while reading.
+    """
+    if fields and "data" in document:
+        document["data"] = project(document["data"], fields)
+    return document
+
+
+STORAGE_BACKENDS = {
+    "mongo": MongoStorage,
+    "sqlite": SQLiteStorage,
+    "memory": MemoryStorage,
+}
+
+_storage = None
+
+
+def get_storage() -> StorageBackend:
+    """
+    Return the storage backend selected by STORAGE_BACKEND, created on first use.
+    """
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND not in STORAGE_BACKENDS:
+            raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}', expected one of {list(STORAGE_BACKENDS)}")
+        _storage = STORAGE_BACKENDS[STORAGE_BACKEND]()
+    return _storage
+
+
+def set_storage(storage: StorageBackend):
+    """
+    Replace the storage backend, e.g. with a MemoryStorage in benchmarks.
+    """
+    global _storage
+    _storage = storage
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+
+from components.custom_logger import get_logger
+from components.metrics import add_gauge, increment, observe
+from components.tracing import span
+
+load_dotenv()
+
+logger = get_logger("upstream")
+
+# Adaptive timeouts: a multiple of the recent p95 latency of each endpoint, kept within these bounds
+UPSTREAM_TIMEOUT_MIN = float(os.getenv("UPSTREAM_TIMEOUT_MIN", 5))
+UPSTREAM_TIMEOUT_MAX = float(os.getenv("UPSTREAM_TIMEOUT_MAX", 60))
+UPSTREAM_TIMEOUT_FACTOR = float(os.getenv("UPSTREAM_TIMEOUT_FACTOR", 3))
+LATENCY_SAMPLES = 100  # Recent latencies kept per endpoint
+
+# Retries with jittered exponential backoff
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", 0.5))  # Seconds
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", 10))  # Seconds
+UPSTREAM_RETRY_AFTER_MAX = float(os.getenv("UPSTREAM_RETRY_AFTER_MAX", 30))  # Longer Retry-After waits are not retried
+
+# Circuit breaker shared by all workers through Redis
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))  # Failures that open the circuit
+CIRCUIT_FAILURE_WINDOW = int(os.getenv("CIRCUIT_FAILURE_WINDOW", 60))  # Seconds failures are counted for
+CIRCUIT_OPEN_SECONDS = int(os.getenv("CIRCUIT_OPEN_SECONDS", 30))  # Seconds the circuit stays open
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Count a failure and start the window with the first one. A script on the single key stays atomic in
+# REDIS_MODE=cluster, where MULTI/EXEC pipelines are not available.
+RECORD_FAILURE_LUA_SCRIPT = """
+local failures = redis.call('INCR', KEYS[1])
+if redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return failures
+"""
+
+latencies = {}  # endpoint -> deque of recent successful request latencies in seconds
+
+
+class UpstreamError(Exception):
+    """
+    Raised when the upstream API call fails after all retries, or is skipped because the circuit is open.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def get_timeout(endpoint):
+    """
+    Return the request timeout for an endpoint, derived from the p95 of its recent latencies.
+    """
+    samples = latencies.get(endpoint)
+    if not samples:
+        return UPSTREAM_TIMEOUT_MAX
+
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return min(UPSTREAM_TIMEOUT_MAX, max(UPSTREAM_TIMEOUT_MIN, p95 * UPSTREAM_TIMEOUT_FACTOR))
+
+
+def record_latency(endpoint, seconds):
+    latencies.setdefault(endpoint, deque(maxlen=LATENCY_SAMPLES)).append(seconds)
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date.
+
+    Returns:
+        float: The number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Return the full-jitter exponential backoff for a retry attempt, never shorter than Retry-After.
+    """
+    delay = random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+async def is_circuit_open(redis: Redis, endpoint):
+    return bool(await redis.exists(f"circuit_open_{endpoint}"))
+
+
+async def record_failure(redis: Redis, endpoint):
+    """
+    Count an upstream failure and open the circuit once the threshold is reached within the window.
+    """
+    failures_key = f"circuit_failures_{endpoint}"
+    failures = int(await redis.eval(RECORD_FAILURE_LUA_SCRIPT, 1, failures_key, CIRCUIT_FAILURE_WINDOW))
+
+    if failures >= CIRCUIT_FAILURE_THRESHOLD:
+        await redis.set(f"circuit_open_{endpoint}", failures, ex=CIRCUIT_OPEN_SECONDS)
+        await redis.delete(failures_key)
+        logger.error(f"Circuit opened for endpoint {endpoint} after {failures} failures")
+
+
+async def record_success(redis: Redis, endpoint):
+    await redis.delete(f"circuit_failures_{endpoint}")
+
+
+async def read_body(response: httpx.Response) -> bytearray:
+    """
+    Read a streamed response body into a single buffer. httpx's own read keeps every chunk until it joins
+    them, here each chunk is appended to one buffer and released right away.
+    """
+    body = bytearray()
+    async for chunk in response.aiter_bytes():
+        body += chunk
+    return body
+
+
+async def request_with_retries(url, headers, params, redis: Redis, endpoint, acquire_slot):
+    """
+    Call the upstream API with adaptive timeouts, jittered retries and the shared circuit breaker.
+
+    Args:
+        url (str): The API URL.
+        headers (dict): The request headers.
+        params (dict): The query parameters.
+        redis (Redis): The Redis client holding the circuit breaker state.
+        endpoint (str): The API endpoint, used for timeouts and the circuit breaker.
+        acquire_slot (Callable): Coroutine function awaited before every attempt to respect the rate limit.
+
+    Returns:
+        tuple: The successful httpx.Response and its body, see read_body.
+
+    Raises:
+        UpstreamError: If the circuit is open, the error is not retryable or all retries failed.
+    """
+    if await is_circuit_open(redis, endpoint):
+        raise UpstreamError(503, f"Circuit open for endpoint {endpoint}")
+
+    attempt = 0
+    while True:
+        await acquire_slot()
+
+        retry_after = None
+        status = "error"
+        start_time = time.perf_counter()
+        add_gauge("upstream_in_flight", 1, endpoint=endpoint)
+        try:
+            with span("upstream", endpoint=endpoint, attempt=attempt):
+                async with httpx.AsyncClient(timeout=get_timeout(endpoint)) as client:
+                    async with client.stream("GET", url, headers=headers, params=params) as response:
+                        status = response.status_code
+                        if response.is_error:
+                            await response.aread()  # The error body is kept as the error detail
+                        response.raise_for_status()
+                        body = await read_body(response)
+            record_latency(endpoint, time.perf_counter() - start_time)
+            await record_success(redis, endpoint)
+            return response, body
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error occurred: {e.response.text}")
+            error = UpstreamError(e.response.status_code, e.response.text)
+            if e.response.status_code not in RETRYABLE_STATUS_CODES:
+                raise error
+            retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+        except httpx.TimeoutException as e:
+            logger.error(f"Timeout after {get_timeout(endpoint):.1f}s for endpoint {endpoint}: {str(e)}")
+            record_latency(endpoint, time.perf_counter() - start_time)
+            status = "timeout"
+            error = UpstreamError(504, f"Upstream timeout: {str(e)}")
+        except Exception as e:
+            logger.error(f"An error occurred: {str(e)}")
+            error = UpstreamError(500, str(e))
+        finally:
+            add_gauge("upstream_in_flight", -1, endpoint=endpoint)
+            increment("upstream_requests_total", endpoint=endpoint, status=status)
+            observe("upstream_request_duration_seconds", time.perf_counter() - start_time, endpoint=endpoint)
+
+        await record_failure(redis, endpoint)
+
+        if attempt >= UPSTREAM_MAX_RETRIES or (retry_after or 0) > UPSTREAM_RETRY_AFTER_MAX:
+            raise error
+        if await is_circuit_open(redis, endpoint):
+            raise UpstreamError(503, f"Circuit open for endpoint {endpoint}")
+
+        delay = backoff_delay(attempt, retry_after)
+        logger.warning(f"Retrying endpoint {endpoint} in {delay:.2f}s (attempt {attempt + 1}/{UPSTREAM_MAX_RETRIES})")
+        await asyncio.sleep(delay)
+        attempt += 1
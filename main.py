@@ -1,14 +1,25 @@
-from fastapi import FastAPI, Depends
+import os
+from fastapi import FastAPI, Depends, Request
 from fastapi.security import HTTPBasicCredentials
 from starlette.config import Config
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from auth.fastapi_auth import verify_credentials, get_secret_key
-from db.mdb_client import client_motors
+from components.custom_logger import logging_stats
+from components.loop_monitor import LoopMonitor
+from components.metrics import MetricsRegistry
+from components.offload import OffloadPool
+from components.tracing import finish_trace, start_trace
+from db.cache_writer import CacheWriter
+from db.rapidapi_client import clear_cache_keys, ensure_cache_indexes
 from db.redis_client import AsyncRedisClient
+from db.refresh_scheduler import RefreshScheduler
+from db.review_stats import ensure_review_indexes
+from db.storage import get_storage
 from dotenv import load_dotenv
 
-from routers import hotels
+from routers import admin, hotels
 
 
 # Custom FastAPI app to hold state
@@ -16,6 +27,12 @@ class CustomFastAPI(FastAPI):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.redis_client = None
+        self.storage = None
+        self.cache_writer = None
+        self.refresh_scheduler = None
+        self.metrics = None
+        self.loop_monitor = None
+        self.offload_pool = None
 
 
 # Initialize FastAPI app
@@ -34,10 +51,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"]
+    expose_headers=["Content-Disposition", "Server-Timing", "ETag"]
 )
 
 
+# Time the phases of every request for the Server-Timing header and sampled trace logs
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace, token = start_trace()
+    response = None
+    try:
+        response = await call_next(request)
+        return response
+    finally:
+        # Also resets the trace context of requests that raised
+        finish_trace(trace, token, request, response)
+
+
 # Dependency to get the Redis client
 def get_redis_client(request: CustomFastAPI):
     return request.redis_client
@@ -47,29 +77,66 @@ def get_redis_client(request: CustomFastAPI):
 prefix_path = '/api/v1'
 app.include_router(hotels.router, prefix=f'{prefix_path}/data', dependencies=[Depends(get_secret_key)],
                    tags=["Hotels"])
+app.include_router(admin.router, prefix=f'{prefix_path}/admin', dependencies=[Depends(verify_credentials)],
+                   tags=["Admin"])
 
 
 @app.on_event("startup")
 async def startup():
     # Connect to Redis
     app.redis_client = await AsyncRedisClient.get_instance()
-    app.mdb_client = client_motors.booking  # MongoDB client instance
-
-    # Clear all Redis cache
-    try:
-        await app.redis_client.flushdb()
-        print("Successfully cleared all Redis cache.")
-    except Exception as e:
-        print(f"Error clearing Redis cache: {str(e)}")
+    app.storage = get_storage()  # MongoDB by default, see STORAGE_BACKEND
+    await ensure_cache_indexes()
+    await ensure_review_indexes()
+
+    # Start the write-behind queue for Redis and storage cache writes
+    app.cache_writer = CacheWriter.get_instance()
+    app.cache_writer.start()
+
+    # Start the proactive refresh of hot cache keys
+    app.refresh_scheduler = RefreshScheduler.get_instance()
+    app.refresh_scheduler.start(app.redis_client)
+
+    # Start flushing metrics to Redis, where /metrics aggregates them across workers
+    app.metrics = MetricsRegistry.get_instance()
+    app.metrics.add_collector("cache_writer", app.cache_writer.stats)
+    app.metrics.add_collector("refresh", app.refresh_scheduler.stats)
+    app.metrics.add_collector("logging", logging_stats)
+
+    # Start the worker processes for large payloads when offloading is enabled
+    app.offload_pool = OffloadPool.get_instance()
+    await app.offload_pool.start()
+    app.metrics.add_collector("offload", app.offload_pool.stats)
+
+    # Watch the event loop for lag and report the routes that block it
+    app.loop_monitor = LoopMonitor.get_instance()
+    app.loop_monitor.start(app.routes)
+    app.metrics.add_collector("event_loop", app.loop_monitor.stats)
+    app.metrics.start(app.redis_client)
+
+    # Clear the cached data in Redis, unless it was pre-populated from a snapshot. Metrics, circuit breaker and
+    # access tracking keys are shared by all workers and kept.
+    if os.getenv("REDIS_FLUSH_ON_STARTUP", "true").lower() == "true":
+        try:
+            deleted = await clear_cache_keys(app.redis_client)
+            print(f"Successfully cleared {deleted} cached keys from Redis.")
+        except Exception as e:
+            print(f"Error clearing Redis cache: {str(e)}")
 
     # # Optionally: Perform other startup tasks (e.g., connecting to MongoDB)
     # print("Connected to MongoDB and Redis.")
 
 
-# Shutdown event to close Redis connection
+# Shutdown event to flush pending cache writes and close the Redis and storage connections
 @app.on_event("shutdown")
 async def shutdown():
+    await app.loop_monitor.stop()
+    await app.refresh_scheduler.stop()
+    await app.cache_writer.close()
+    await app.offload_pool.close()
+    await app.metrics.stop()
     await app.redis_client.close()
+    await app.storage.close()
 
 
 # Custom OpenAPI and Docs Endpoints
@@ -90,6 +157,12 @@ async def ping():
     return {"status": "alive"}
 
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_credentials)])
+async def metrics():
+    return PlainTextResponse(await app.metrics.render(app.redis_client),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/docs", include_in_schema=False)
 async def custom_docs_url(credentials: HTTPBasicCredentials = Depends(verify_credentials)):
     from fastapi.openapi.docs import get_swagger_ui_html
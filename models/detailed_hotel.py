@@ -1,5 +1,5 @@
-from typing import Optional, Dict, Any
-from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, TypeAdapter
 
 
 class Location(BaseModel):
@@ -50,3 +50,7 @@ class Items(BaseModel):
 
 class DetailedHotelResponse(BaseModel):
     items: Optional[Items] = Items()  # Default to empty Items object
+
+
+# Serializer for a /detailed_hotel response
+detailed_hotels_adapter = TypeAdapter(List[DetailedHotelResponse])
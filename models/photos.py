@@ -1,5 +1,5 @@
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 
 class Tag(BaseModel):
@@ -23,3 +23,7 @@ class Photo(BaseModel):
     url_square60: Optional[str] = None
     url_max: Optional[str] = None
     url_1440: Optional[str] = None
+
+
+# Compiled validator for a photos response
+photos_adapter = TypeAdapter(List[Photo])
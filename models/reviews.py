@@ -1,5 +1,5 @@
-from pydantic import BaseModel, HttpUrl
-from typing import List, Optional
+from pydantic import BaseModel, HttpUrl, TypeAdapter
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 
 
@@ -57,3 +57,30 @@ class ReviewsResponse(BaseModel):
     result: Optional[List[Review]] = None
     count: Optional[int] = None
     sort_options: Optional[List[str]] = None
+
+
+class ReviewsEnvelope(BaseModel):
+    """
+    Only the reviews of a reviews response, the other fields are not validated.
+    """
+    result: Optional[List[Review]] = None
+
+
+class ReviewStats(BaseModel):
+    reviews: int = 0  # Distinct reviews counted
+    average_score: Optional[float] = None
+    score_histogram: Dict[str, int] = {}  # Reviews per whole score, e.g. '8' for scores from 8.0 to 8.9
+    travel_purpose: Dict[str, int] = {}
+    language: Dict[str, int] = {}
+
+
+class ReviewsAggregateResponse(BaseModel):
+    hotel_id: int
+    pages: int  # Pages fetched for this response
+    reviews: List[Review] = []
+    stats: ReviewStats = ReviewStats()  # Statistics of every review counted so far, not only these pages
+
+
+# Compiled validators for a reviews response, either the full response or the list of reviews
+reviews_adapter = TypeAdapter(List[Review])
+reviews_payload_adapter = TypeAdapter(Union[ReviewsEnvelope, List[Review]])
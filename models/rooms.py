@@ -1,5 +1,5 @@
 from typing import Optional, List, Dict, Union, Any
-from pydantic import BaseModel, validator # noqa
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
 
 
 class BMaxLosData(BaseModel):
@@ -76,7 +76,7 @@ class RoomsData(BaseModel):
     block: Optional[Any] = []
     b_max_los_data: Optional[BMaxLosData] = None
     rooms: Optional[Any] = []
-    preferences: Optional[List[str]] = []
+    preferences: List[str] = Field(default=[], validate_default=True)
     recommended_block_title: Optional[str] = None
     hotel_id: Optional[int]
     qualifies_for_no_cc_reservation: Optional[int] = None
@@ -103,10 +103,12 @@ class RoomsData(BaseModel):
     last_matching_block_index: Optional[int] = None
     soldout_rooms: Optional[List[str]] = []
     tax_exceptions: Optional[List[str]] = []
-    preferences: Optional[Any] = None
+
+    model_config = ConfigDict(extra='ignore')
 
     # Validator for the 'preferences' field
-    @validator("preferences", pre=True, always=True) # noqa
+    @field_validator("preferences", mode="before")
+    @classmethod
     def validate_preferences(cls, v):
         # Ensure that 'preferences' is a list of strings or valid data
         if isinstance(v, list):
@@ -114,5 +116,6 @@ class RoomsData(BaseModel):
             return [item if isinstance(item, str) else str(item) for item in v]
         return []
 
-    class Config:
-        extra = 'ignore'
+
+# Compiled validator for a room list response
+rooms_data_adapter = TypeAdapter(List[RoomsData])
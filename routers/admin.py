@@ -0,0 +1,39 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+
+from components.loop_monitor import LoopMonitor
+from components.profiler import PROFILE_MAX_SECONDS, ProfileInProgress, profile_cpu, profile_stacks
+
+router = APIRouter()
+
+
+# Event loop lag and the most recent stalls of this worker
+@router.get("/loop")
+async def get_loop_stats():
+    monitor = LoopMonitor.get_instance()
+    return {"pid": os.getpid(), **monitor.stats(), "slow_callbacks": list(monitor.slow_callbacks)}
+
+
+# Time-boxed profile of this worker
+@router.get("/profile")
+async def get_profile(
+        seconds: float = Query(default=10, gt=0, le=PROFILE_MAX_SECONDS, description="How long to profile, in seconds."),
+        mode: str = Query(default="cpu", pattern="^(cpu|stacks)$", description="'cpu' returns a cProfile pstats file, 'stacks' returns sampled collapsed stacks for flame graphs.")
+):
+    """
+    Profile the worker that serves this request while it handles its regular traffic.
+
+    Returns:
+        Response: A pstats file for mode 'cpu', or collapsed stack samples as text for mode 'stacks'.
+    """
+    try:
+        if mode == "stacks":
+            return PlainTextResponse(await profile_stacks(seconds))
+        profile = await profile_cpu(seconds)
+    except ProfileInProgress:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+
+    return Response(profile, media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="profile-{os.getpid()}.prof"'})
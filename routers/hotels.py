@@ -3,18 +3,28 @@ import os
 from typing import List, Optional
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, Request, Query
+from fastapi import APIRouter, Depends, Request, Query, Response
 from datetime import datetime
-from db.rapidapi_client import get_data_or_cache
+from db.rapidapi_client import get_data_or_cache, get_many_data_or_cache
+from db.response_cache import get_composed_response_or_render, get_many_responses_or_render, get_response_or_render
+from db.review_stats import (REVIEWS_AGGREGATE_MAX_PAGES, REVIEWS_PER_PAGE, fetch_review_pages, prefetch_review_page,
+                             review_key, update_review_stats)
+from db.review_index import REVIEWS_LOCAL_FILTER_ENABLED, get_local_reviews
 from datetime import timedelta
 from redis.asyncio import Redis
 
 from db.redis_client import AsyncRedisClient
-from components.transform_data import transform_data, transform_room_data, extract_hotel_data
-from models.detailed_hotel import DetailedHotelResponse
+from components.fields import dump_fields, fields_variant, parse_fields, subtree
+from components.http_cache import cached_response, combine_entries
+from components.offload import offload
+from components.room_tasks import ROOM_LIST_REQUIRED_FIELDS, parse_rooms, render_room_list, summarize_room_list
+from components.tracing import span
+from components.transform_data import transform_data, transform_room_data
+from models.detailed_hotel import DetailedHotelResponse, detailed_hotels_adapter
 from models.hotels import HotelsResponse, Hotel
-from models.photos import Photo
-from models.reviews import Review
+from models.photos import Photo, photos_adapter
+from models.reviews import (Review, ReviewsAggregateResponse, ReviewsEnvelope, ReviewStats, reviews_adapter,
+                            reviews_payload_adapter)
 from models.rooms import RoomsData
 
 router = APIRouter()
@@ -27,41 +37,50 @@ redis_expire_seconds = int(os.getenv("EXPIRE_SECONDS", 5))  # Default to 5 secon
 # Endpoint to get hotel data
 @router.get("/hotel")
 async def get_hotel_data(
+        request: Request,
         hotel_id: int = Query(default=4469654, description="The unique ID of the hotel for which details are being requested. Default is 4469654."),
         locale: str = Query(default="en-gb", description="The locale for language and formatting preferences. Default is 'en-gb'."),
         redis: Redis = Depends(AsyncRedisClient.get_instance),  # Redis dependency for caching
         expire_hours: int = Query(default=mongo_expire_hours, description="The number of hours for which the hotel data will be cached. Uses a default value defined by mongo_expire_hours.")
 ):
     params = {'hotel_id': hotel_id, 'locale': locale}
-    cache_key = f"hotel_data_{hotel_id}_{locale}"
 
-    # Fetch the hotel data, either from cache or source
-    hotel_data = await get_data_or_cache("data", params, cache_key, redis_expire_seconds, redis, expire_hours)
+    # Fetch the validated hotel, either as a cached response or rendered from the cached data
+    entry = await get_response_or_render("data", params, redis_expire_seconds, redis, render_hotel, expire_hours,
+                                         headers=request.headers)
+
+    return cached_response(request.headers, entry, expire_hours)
 
-    # Ensure the data matches the Pydantic model structure
-    hotel = Hotel(**hotel_data)
 
-    return hotel
+async def render_hotel(raw):
+    """
+    Validate raw hotel data against the Hotel model and return it as JSON. Raw JSON text is validated as
+    is, without decoding it into a dict first.
+    """
+    # Ensure the data matches the Pydantic model structure
+    with span("validate"):
+        if isinstance(raw, (str, bytes)):
+            return Hotel.model_validate_json(raw).model_dump_json(by_alias=True)
+        return Hotel.model_validate(raw).model_dump_json(by_alias=True)
 
 
 # Fetch multiple hotels' data concurrently
 @router.get("/hotels/", response_model=HotelsResponse)
 async def get_multiple_hotels_data(
+        request: Request,
         hotel_ids: List[int] = Query(default=[2534439, 4469654], alias="hotel_ids", description="A list of hotel IDs to fetch information for. Default values are 2534439 and 4469654."),
         locale: str = Query(default="en-gb", description="The locale for language and formatting preferences. Default is 'en-gb'."),
         redis: Redis = Depends(AsyncRedisClient.get_instance),  # Redis dependency for caching
         expire_hours: int = Query(default=72, description="The number of hours for which the data will be cached. Default is 72 hours.")
 ):
-    # Gather hotel data for each ID
-    results = await asyncio.gather(
-        *[get_hotel_data(hotel_id=hotel_id, locale=locale, redis=redis, expire_hours=expire_hours)
-          for hotel_id in hotel_ids]
-    )
-
-    # Convert the results into the HotelsResponse model
-    hotels = [hotel_data for hotel_data in results]
+    # Resolve all hotels with one batched cache lookup
+    params_list = [{'hotel_id': hotel_id, 'locale': locale} for hotel_id in hotel_ids]
+    entries = await get_many_responses_or_render("data", params_list, redis_expire_seconds, redis, render_hotel,
+                                                 expire_hours)
 
-    return {"hotels": hotels}
+    # Combine the validated hotels into the HotelsResponse structure
+    body = '{"hotels":[' + ",".join(entry["body"] for entry in entries) + ']}'
+    return cached_response(request.headers, combine_entries(body, entries), expire_hours)
 
 
 # Endpoint to get hotel photos
@@ -70,22 +89,40 @@ async def get_hotel_photos(
         req: Request,  # Request object for metadata and context
         hotel_id: int = Query(default=4469654, description="The ID of the hotel to fetch details for. Default is 4469654."),
         locale: str = Query(default="en-gb", description="The locale for language and formatting preferences. Default is 'en-gb'."),
-        expire_hours: int = Query(default=mongo_expire_hours, description="The number of hours for which the data will be cached. The default value is taken from the environment setting (mongo_expire_hours).")
+        expire_hours: int = Query(default=mongo_expire_hours, description="The number of hours for which the data will be cached. The default value is taken from the environment setting (mongo_expire_hours)."),
+        fields: Optional[str] = Query(default=None, description="(Optional) Comma separated fields to return for each photo, nested fields joined with dots. For example, 'photo_id,url_max'.")
 ):
     redis = req.app.redis_client
     params = {'hotel_id': hotel_id, 'locale': locale}
-    cache_key = f"hotel_photos_{hotel_id}_{locale}"
+    field_tree = parse_fields(fields)
 
-    # Fetch the data from cache or API, this function should return a list of photo data
-    photos_data = await get_data_or_cache("photos", params, cache_key, redis_expire_seconds, redis, expire_hours)
+    # Fetch the validated photo list, either as a cached response or rendered from the cached data
+    entry = await get_response_or_render("photos", params, redis_expire_seconds, redis,
+                                         lambda raw: render_photos(raw, field_tree), expire_hours, field_tree,
+                                         req.headers)
 
-    # Return the photos list, Pydantic will validate the structure against the Photo model
-    return photos_data
+    return cached_response(req.headers, entry, expire_hours)
+
+
+async def render_photos(raw, fields=None):
+    """
+    Validate a raw photo list against the Photo model and return it as JSON, limited to the field tree of a
+    fields= selector if one is given.
+    """
+    with span("validate"):
+        if isinstance(raw, (str, bytes)):
+            photos = photos_adapter.validate_json(raw)
+        else:
+            photos = photos_adapter.validate_python(raw)
+        if fields:
+            return dump_fields(photos_adapter.dump_python(photos, mode="json", by_alias=True), fields)
+        return photos_adapter.dump_json(photos, by_alias=True)
 
 
 # Endpoint to get hotel reviews
 @router.get("/reviews", response_model=List[Review])
 async def get_hotel_reviews(
+        request: Request,
         hotel_id: int = Query(default=4469654, description="The ID of the hotel to fetch reviews for. Default is 4469654."),
         locale: str = Query(default="en-gb", description="The locale for language and formatting preferences. Default is 'en-gb'."),
         customer_type: str = Query(default="solo_traveller,review_category_group_of_friends", description="Filter reviews by customer types. Provide customer types separated by commas. For example: 'solo_traveller,review_category_group_of_friends'."),
@@ -103,10 +140,40 @@ async def get_hotel_reviews(
         'language_filter': language_filter,
         'page_number': page_number
     }
-    cache_key = f"hotel_reviews_{hotel_id}_{locale}_{customer_type}_{sort_type}_{language_filter}_{page_number}"
 
-    # Fetch data from cache or external API
-    response_data = await get_data_or_cache("reviews", params, cache_key, redis_expire_seconds, redis, expire_hours)
+    if REVIEWS_LOCAL_FILTER_ENABLED:
+        # Filter and sort the hotel's unfiltered reviews locally, see db/review_index.py
+        async def render():
+            reviews = await get_local_reviews(params, redis_expire_seconds, redis, expire_hours)
+            if reviews is None:
+                # The review index can't answer this page, ask the API for the filtered page
+                reviews = await get_data_or_cache("reviews", params, redis_expire_seconds, redis, expire_hours, raw=True)
+            return await render_reviews(reviews)
+
+        entry = await get_composed_response_or_render("reviews-local", params, redis_expire_seconds, redis, render,
+                                                      request.headers)
+        return cached_response(request.headers, entry, redis_expire_seconds / 3600)
+
+    # Fetch the validated reviews, either as a cached response or rendered from the cached data
+    entry = await get_response_or_render("reviews", params, redis_expire_seconds, redis, render_reviews, expire_hours,
+                                         headers=request.headers)
+
+    return cached_response(request.headers, entry, expire_hours)
+
+
+async def render_reviews(raw):
+    """
+    Extract the reviews from a raw reviews response, validate them against the Review model and return
+    them as JSON. Raw JSON text is validated as is, without decoding it into dicts first.
+    """
+    if isinstance(raw, (str, bytes)):
+        with span("validate"):
+            payload = reviews_payload_adapter.validate_json(raw)
+            reviews = payload.result if isinstance(payload, ReviewsEnvelope) else payload
+            if reviews is None:
+                raise ValueError("Expected list of reviews, but got something else")
+            return reviews_adapter.dump_json(reviews, by_alias=True)
+    response_data = raw
 
     # Assuming the actual reviews are nested under a 'result' key, extract them
     # You might need to adjust 'result' to match the actual structure you're receiving
@@ -119,12 +186,65 @@ async def get_hotel_reviews(
     if not isinstance(reviews_data, list):
         raise ValueError("Expected list of reviews, but got something else")
 
-    return reviews_data
+    with span("validate"):
+        return reviews_adapter.dump_json(reviews_adapter.validate_python(reviews_data), by_alias=True)
+
+
+# Endpoint to get several pages of hotel reviews at once, with the statistics of the hotel's reviews
+@router.get("/reviews-aggregate", response_model=ReviewsAggregateResponse)
+async def get_hotel_reviews_aggregate(
+        hotel_id: int = Query(default=4469654, description="The ID of the hotel to fetch reviews for. Default is 4469654."),
+        locale: str = Query(default="en-gb", description="The locale for language and formatting preferences. Default is 'en-gb'."),
+        customer_type: str = Query(default="solo_traveller,review_category_group_of_friends", description="Filter reviews by customer types. Provide customer types separated by commas. For example: 'solo_traveller,review_category_group_of_friends'."),
+        sort_type: str = Query(default="SORT_MOST_RELEVANT", description="The sort type for the reviews. Default is 'SORT_MOST_RELEVANT'."),
+        language_filter: str = Query(default="en-us", description="Filter reviews by language. Default is 'en-us'."),
+        pages: int = Query(default=5, ge=1, le=REVIEWS_AGGREGATE_MAX_PAGES, description=f"The number of pages to fetch, starting with the first. At most {REVIEWS_AGGREGATE_MAX_PAGES}."),
+        redis: Redis = Depends(AsyncRedisClient.get_instance),  # Redis instance for caching
+        expire_hours: int = Query(default=mongo_expire_hours, description="The number of hours for which the data will be cached. The default value is taken from the environment setting (mongo_expire_hours).")
+):
+    params = {
+        'hotel_id': hotel_id,
+        'locale': locale,
+        'customer_type': customer_type,
+        'sort_type': sort_type,
+        'language_filter': language_filter
+    }
+
+    # Fetch the pages concurrently, the uncached ones from the API under the shared rate limit
+    page_list = await fetch_review_pages(params, list(range(pages)), redis_expire_seconds, redis, expire_hours)
+
+    # A page that is not full is the last one
+    for page_number, reviews in enumerate(page_list):
+        if len(reviews) < REVIEWS_PER_PAGE:
+            page_list = page_list[:page_number + 1]
+            break
+    else:
+        # Clients that want more most likely ask for the next page, fetch it already
+        prefetch_review_page(params, pages, redis_expire_seconds, redis, expire_hours)
+
+    # Reviews that moved to the next page while the pages were cached show up twice
+    unique_reviews = {}
+    for reviews in page_list:
+        for review in reviews:
+            unique_reviews.setdefault(review_key(review), review)
+
+    stats = await update_review_stats(params, dict(enumerate(page_list)))
+
+    # Validated once here and returned pre-serialized, so the response_model only documents the schema
+    with span("validate"):
+        body = ReviewsAggregateResponse(
+            hotel_id=hotel_id,
+            pages=len(page_list),
+            reviews=reviews_adapter.validate_python(list(unique_reviews.values())),
+            stats=ReviewStats(**stats)
+        ).model_dump_json(by_alias=True)
+    return Response(body, media_type="application/json")
 
 
 # Endpoint to get hotel room list
 @router.get("/room-list", response_model=Optional[List[RoomsData]])
 async def get_hotel_room_list(
+        request: Request,
         hotel_id: int = Query(default=4469654, description="The ID of the hotel to fetch room data for. Default is 4469654."),
         checkin_date: str = Query(default=(datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d'), description="Check-in date in YYYY-MM-DD format. Default is 30 days from today."),
         checkout_date: str = Query(default=(datetime.now() + timedelta(days=31)).strftime('%Y-%m-%d'), description="Check-out date in YYYY-MM-DD format. Default is 31 days from today."),
@@ -144,41 +264,59 @@ async def get_hotel_room_list(
         currency: str = Query(default="EUR", description="The currency to display prices in. Default is 'EUR' (Thai Baht)."),
         locale: str = Query(default="en-gb", description="The locale for language and formatting preferences. Default is 'en-gb'."),
         redis: Redis = Depends(AsyncRedisClient.get_instance),  # Redis instance for caching
-        expire_hours: int = Query(default=8, description="The number of hours for which the data will be cached. Default is 8 hours.")
+        expire_hours: int = Query(default=8, description="The number of hours for which the data will be cached. Default is 8 hours."),
+        fields: Optional[str] = Query(default=None, description="(Optional) Comma separated fields to return for each room list, nested fields joined with dots. For example, 'hotel_id,block.block_id,block.min_price'.")
 ):
-    # Build params dictionary without children if they are None, empty, or zero
-    params = {
+    params = build_room_list_params(hotel_id, checkin_date, checkout_date, adults_number_by_rooms, units, currency,
+                                    locale, children_ages, children_number_by_rooms)
+    field_tree = parse_fields(fields)
+
+    # Storage reads include the fields a room list needs to be validated
+    storage_fields = {**field_tree, **dict.fromkeys(ROOM_LIST_REQUIRED_FIELDS, True)} if field_tree else None
+
+    # Fetch the validated room list, either as a cached response or rendered from the cached data
+    entry = await get_response_or_render("room-list", params, redis_expire_seconds, redis,
+                                         lambda raw: render_rooms(raw, field_tree), expire_hours, storage_fields,
+                                         request.headers)
+
+    return cached_response(request.headers, entry, expire_hours)
+
+
+async def render_rooms(raw, fields=None):
+    """
+    Validate a raw room list and return it as JSON, large room lists are processed off the event loop.
+    """
+    return await offload(render_room_list, raw, fields)
+
+
+def build_room_list_params(hotel_id, checkin_date, checkout_date, adults_number_by_rooms, units, currency, locale,
+                           children_ages=None, children_number_by_rooms=None):
+    """
+    Build the API params for a hotel room list request. Children params that are None, empty or zero are
+    dropped when the params are normalized.
+
+    Returns:
+        dict: The params dictionary.
+    """
+    return {
         'hotel_id': hotel_id,
         'checkin_date': checkin_date,
         'checkout_date': checkout_date,
         'adults_number_by_rooms': adults_number_by_rooms,
         'units': units,
         'currency': currency,
-        'locale': locale
+        'locale': locale,
+        'children_ages': children_ages,
+        'children_number_by_rooms': children_number_by_rooms
     }
 
-    # Add children parameters only if they are not None, empty, or zero
-    if children_ages and children_ages != "0":
-        params['children_ages'] = children_ages
-    if children_number_by_rooms and children_number_by_rooms != "0":
-        params['children_number_by_rooms'] = children_number_by_rooms
-
-    # Create a cache key based on the parameters
-    cache_key = f"hotel_room_list_{hotel_id}_{checkin_date}_{checkout_date}_{children_ages}_{children_number_by_rooms}_{adults_number_by_rooms}_{units}_{currency}_{locale}"
-
-    # Fetch data or use the cached result
-    hotel_data = await get_data_or_cache("room-list", params, cache_key, redis_expire_seconds, redis, expire_hours)
 
-    # Ensure hotel_data is a list
-    if isinstance(hotel_data, list):
-        return [RoomsData(**room) for room in
-                hotel_data]  # Iterate over the list and initialize RoomsData for each item
-
-    # Handle the case where hotel_data is not a list
-    if hotel_data:
-        return [RoomsData(**hotel_data)]  # Wrap in a list to match the response_model type
-
-    return None  # If no data, return None or appropriate response
+def parse_room_list(hotel_data):
+    """
+    Validate raw room list data into a list of RoomsData models.
+    """
+    with span("validate"):
+        return parse_rooms(hotel_data)
 
 
 # Endpoint to get combined hotel data
@@ -240,43 +378,41 @@ async def get_combined_hotel_data(
     if children_ages:
         params['children_ages'] = children_ages
 
-    # Step 2: Fetch hotel and room data concurrently
-    hotel_data_tasks = [
-        get_hotel_data(hotel_id=hotel_id, locale=locale, redis=redis, expire_hours=expire_hours)
-        for hotel_id in hotel_ids
-    ]
-    room_data_tasks = [
-        get_hotel_room_list(hotel_id=hotel_id, checkin_date=checkin_date, checkout_date=checkout_date,
-                            units="metric", currency="EUR", locale=locale, redis=redis, expire_hours=expire_hours,
-                            adults_number_by_rooms=adults_number_by_rooms,
-                            children_number_by_rooms=children_number_by_rooms,
-                            children_ages=children_ages)
+    # Step 2: Build batched lookups for hotel and room data
+    hotel_params_list = [{'hotel_id': hotel_id, 'locale': locale} for hotel_id in hotel_ids]
+    room_params_list = [
+        build_room_list_params(hotel_id, checkin_date, checkout_date, adults_number_by_rooms, "metric", "EUR", locale,
+                               children_ages, children_number_by_rooms)
         for hotel_id in hotel_ids
     ]
 
-    # Step 3: Run both hotel and room tasks concurrently
-    hotel_responses = await asyncio.gather(*hotel_data_tasks)
-    room_responses = await asyncio.gather(*room_data_tasks)
+    # Step 3: Run both hotel and room lookups concurrently, one batch per collection
+    hotel_results, room_results = await asyncio.gather(
+        get_many_data_or_cache("data", hotel_params_list, redis_expire_seconds, redis, expire_hours),
+        get_many_data_or_cache("room-list", room_params_list, redis_expire_seconds, redis, expire_hours, raw=True)
+    )
+    with span("validate"):
+        hotel_responses = [Hotel(**hotel_data) for hotel_data in hotel_results]
 
-    # Step 4: Combine hotel and room data
-    combined_data = []
-    for hotel_response, room_response in zip(hotel_responses, room_responses):
-        hotel_dict = hotel_response.dict()
-        room_list = [room.dict() for room in room_response] if room_response else []
-        hotel_data = await extract_hotel_data(hotel_dict, room_list, available_rooms_only)
-        combined_data.append(hotel_data)
+    # Step 4: Reduce each room list to its lowest price, large room lists off the event loop
+    combined_data = await asyncio.gather(
+        *[offload(summarize_room_list, room_data, hotel_response.hotel_id, hotel_response.name, available_rooms_only)
+          for hotel_response, room_data in zip(hotel_responses, room_results)]
+    )
 
     return combined_data
 
 
 @router.get("/detailed_hotel", response_model=List[DetailedHotelResponse])
 async def mock_detail_hotel(
+        request: Request,
         hotel_ids: List[int] = Query(default=[4469654], description="A list of hotel IDs to fetch the information for. Example: [4469654, 1234567]."),
         redis: Redis = Depends(AsyncRedisClient.get_instance),  # Redis instance dependency for caching
         expire_hours: int = Query(default=72, description="The number of hours for which the data is cached. Default is 72 hours."),
         disable_google_translations: bool = Query(default=True, description="If set to True, Google Translations are disabled. Default is True."),
         show_photos: bool = Query(default=True, description="If set to True, the hotel photos will be included in the response. Default is True."),
-        show_rooms: bool = Query(default=False, description="If set to True, room information will be included in the response. Default is False.")
+        show_rooms: bool = Query(default=False, description="If set to True, room information will be included in the response. Default is False."),
+        fields: Optional[str] = Query(default=None, description="(Optional) Comma separated fields to return for each hotel, nested fields joined with dots. For example, 'items.hotel.name,items.hotel.photos.url_max'. Photos and rooms are only fetched when selected.")
 ):
     """
     Endpoint to get hotel data in multiple languages and optionally include room and photo data for multiple hotels.
@@ -288,17 +424,50 @@ async def mock_detail_hotel(
         redis (Redis): The Redis client instance.
         show_photos (bool): Whether to fetch and include photos. Defaults to True.
         show_rooms (bool): Whether to fetch and include room data. Defaults to True.
+        fields (str): Comma separated dotted fields to limit the response to. Defaults to all fields.
 
     Returns:
         List[DetailedHotelResponse]: The transformed JSON response containing hotel data for each hotel in multiple languages and room data.
     """
+    field_tree = parse_fields(fields)
+    params = {
+        'hotel_ids': ",".join(map(str, hotel_ids)),
+        'expire_hours': expire_hours,
+        'disable_google_translations': disable_google_translations,
+        'show_photos': show_photos,
+        'show_rooms': show_rooms,
+        'fields': fields_variant(field_tree) if field_tree else None
+    }
+
+    # Render the response once and serve it from the response cache, compressed, until it expires
+    entry = await get_composed_response_or_render(
+        "detailed_hotel", params, redis_expire_seconds, redis,
+        lambda: render_detailed_hotels(hotel_ids, redis, expire_hours, disable_google_translations, show_photos,
+                                       show_rooms, field_tree),
+        request.headers
+    )
+
+    # Clients may keep the response as long as it is cached here
+    return cached_response(request.headers, entry, redis_expire_seconds / 3600)
+
+
+async def render_detailed_hotels(hotel_ids, redis, expire_hours, disable_google_translations, show_photos, show_rooms,
+                                 field_tree=None) -> bytes:
+    """
+    Fetch and transform the data of the hotels, see mock_detail_hotel, and return the response body as JSON.
+    """
     languages = ['it', 'en-gb', 'es', 'fr', 'de']
     detailed_hotels = []
 
+    # Only fetch what the selected fields need, and only the selected photo fields from storage
+    hotel_fields = subtree(field_tree, "items.hotel")
+    fetch_hotel_data = hotel_fields is True or bool(hotel_fields and set(hotel_fields) - {"hotel_id", "photos", "rooms"})
+    photo_fields = subtree(field_tree, "items.hotel.photos")
+    show_photos = show_photos and photo_fields is not None
+    show_rooms = show_rooms and subtree(field_tree, "items.hotel.rooms") is not None
+
     # Loop over each hotel_id and fetch the data
     for hotel_id in hotel_ids:
-        cache_key_template = f"hotel_data_{{}}_{hotel_id}"
-
         # Initialize the transformed_data structure based on the Pydantic model
         transformed_data = {
             "items": {
@@ -327,12 +496,11 @@ async def mock_detail_hotel(
         }
 
         # Fetch and transform data for each language
-        for lang in languages:
+        for lang in languages if fetch_hotel_data else []:
             params = {'hotel_id': hotel_id, 'locale': lang}
-            cache_key = cache_key_template.format(lang)
 
             # Fetch hotel data for the current language
-            raw_data = await get_data_or_cache("data", params, cache_key, redis_expire_seconds, redis, expire_hours)
+            raw_data = await get_data_or_cache("data", params, redis_expire_seconds, redis, expire_hours)
 
             # Use the transformation function to convert raw data and store results per language
             lang_transformed_data = await transform_data(raw_data)
@@ -369,19 +537,19 @@ async def mock_detail_hotel(
         # Optionally fetch photos once for 'en-gb' only if show_photos is True
         if show_photos:
             photo_params = {'hotel_id': hotel_id, 'locale': 'en-gb'}
-            photo_cache_key = f"hotel_photos_{hotel_id}_en-gb"
-            photo_data = await get_data_or_cache("photos", photo_params, photo_cache_key, redis_expire_seconds, redis,
-                                                 expire_hours)
+            photo_data = await get_data_or_cache("photos", photo_params, redis_expire_seconds, redis, expire_hours,
+                                                 fields=photo_fields if isinstance(photo_fields, dict) else None)
 
             if photo_data:
                 transformed_data["items"]["hotel"]["photos"] = photo_data
 
         # Optionally fetch room data if show_rooms is True
         if show_rooms:
-            room_data = await get_hotel_room_list(
-                hotel_id=hotel_id,
-                redis=redis,
-                expire_hours=expire_hours
+            room_params = build_room_list_params(hotel_id, (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d'),
+                                                 (datetime.now() + timedelta(days=31)).strftime('%Y-%m-%d'), "2,1",
+                                                 "metric", "EUR", "en-gb")
+            room_data = parse_room_list(
+                await get_data_or_cache("room-list", room_params, redis_expire_seconds, redis, expire_hours)
             )
 
             if room_data:
@@ -389,7 +557,11 @@ async def mock_detail_hotel(
                 transformed_data["items"]["hotel"]["rooms"] = transformed_room_data["rooms"]
 
         # Append the transformed hotel data to the list
-        detailed_hotels.append(DetailedHotelResponse(**transformed_data))
+        with span("validate"):
+            detailed_hotels.append(DetailedHotelResponse(**transformed_data))
 
     # Return the list of transformed data for each hotel
-    return detailed_hotels
+    with span("serialize"):
+        if field_tree:
+            return dump_fields(detailed_hotels_adapter.dump_python(detailed_hotels, mode="json"), field_tree)
+        return detailed_hotels_adapter.dump_json(detailed_hotels)
@@ -0,0 +1,50 @@
+from db.cache_keys import MAX_KEY_LENGTH, build_cache_key, normalize_params, response_cache_key
+
+
+def test_params_are_sorted_by_name():
+    assert list(normalize_params("data", {"locale": "en-gb", "hotel_id": 1})) == ["hotel_id", "locale"]
+    assert build_cache_key("data", {"locale": "en-gb", "hotel_id": 1}) == \
+        build_cache_key("data", {"hotel_id": 1, "locale": "en-gb"}) == "hotel_data:hotel_id=1&locale=en-gb"
+
+
+def test_none_empty_and_default_values_are_dropped():
+    assert normalize_params("data", {"hotel_id": 1, "locale": None, "currency": ""}) == {"hotel_id": 1}
+    assert normalize_params("room-list", {"hotel_id": 1, "children_ages": "0", "children_number_by_rooms": 0}) == \
+        {"hotel_id": 1}
+    # Defaults only apply to their endpoint
+    assert normalize_params("data", {"children_ages": "0"}) == {"children_ages": "0"}
+
+
+def test_case_insensitive_params_are_lowercased():
+    assert build_cache_key("reviews", {"locale": " EN-GB ", "language_filter": "EN-US"}) == \
+        build_cache_key("reviews", {"locale": "en-gb", "language_filter": "en-us"})
+
+
+def test_unordered_list_params_are_trimmed_and_sorted():
+    params = normalize_params("reviews", {"customer_type": " solo_traveller, couple,,family "})
+    assert params == {"customer_type": "couple,family,solo_traveller"}
+    assert build_cache_key("reviews", {"customer_type": "couple,solo_traveller"}) == \
+        build_cache_key("reviews", {"customer_type": "solo_traveller,couple"})
+
+
+def test_ordered_list_params_keep_their_order():
+    assert build_cache_key("room-list", {"adults_number_by_rooms": "2,1"}) != \
+        build_cache_key("room-list", {"adults_number_by_rooms": "1,2"})
+
+
+def test_endpoints_have_their_own_prefix():
+    assert build_cache_key("room-list", {"hotel_id": 1}).startswith("hotel_room_list:")
+    assert build_cache_key("review-index", {"hotel_id": 1}).startswith("review-index:")
+
+
+def test_long_keys_are_hashed():
+    key = build_cache_key("data", {"hotel_id": 1, "filter": "x" * MAX_KEY_LENGTH})
+    assert key.startswith("hotel_data:sha1:")
+    assert len(key) <= MAX_KEY_LENGTH
+    assert key == build_cache_key("data", {"filter": "x" * MAX_KEY_LENGTH, "hotel_id": 1})
+    assert key != build_cache_key("data", {"hotel_id": 2, "filter": "x" * MAX_KEY_LENGTH})
+
+
+def test_response_cache_key():
+    assert response_cache_key("hotel_data:hotel_id=1") == "hotel_data:hotel_id=1:response"
+    assert response_cache_key("hotel_data:hotel_id=1", "name") == "hotel_data:hotel_id=1:response:name"
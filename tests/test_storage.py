@@ -0,0 +1,75 @@
+"""
+Contract of the storage backends: MemoryStorage and SQLiteStorage must answer every operation the same way.
+"""
+import asyncio
+
+import pytest
+
+from components.fields import parse_fields
+from db.storage import MemoryStorage, SQLiteStorage
+
+DOCUMENTS = [
+    {"cache_key": "hotel_data:hotel_id=1", "hotel_id": 1, "created_at": "2024-09-25T10:00:00+03:00",
+     "data": {"name": "One", "block": [{"min_price": 10, "room_id": 1}], "address": "Street 1"}},
+    {"cache_key": "hotel_data:hotel_id=2", "hotel_id": 2, "created_at": "2024-09-26T10:00:00+03:00",
+     "data": {"name": "Two", "block": [{"min_price": 20, "room_id": 2}], "address": "Street 2"}},
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    backend = MemoryStorage() if request.param == "memory" else SQLiteStorage(str(tmp_path / "cache.db"))
+    asyncio.run(backend.put_many("data", DOCUMENTS))
+    yield backend
+    asyncio.run(backend.close())
+
+
+async def collect(iterator):
+    return [document async for document in iterator]
+
+
+def test_get(storage):
+    assert asyncio.run(storage.get("data", "hotel_data:hotel_id=1")) == DOCUMENTS[0]
+    assert asyncio.run(storage.get("data", "hotel_data:hotel_id=3")) is None
+    assert asyncio.run(storage.get("photos", "hotel_data:hotel_id=1")) is None
+
+
+def test_get_with_fields(storage):
+    document = asyncio.run(storage.get("data", "hotel_data:hotel_id=1", parse_fields("name,block.min_price")))
+    assert document["data"] == {"name": "One", "block": [{"min_price": 10}]}
+    assert document["cache_key"] == "hotel_data:hotel_id=1"
+    assert document["created_at"] == DOCUMENTS[0]["created_at"]
+    # The projection does not change the stored document
+    assert asyncio.run(storage.get("data", "hotel_data:hotel_id=1")) == DOCUMENTS[0]
+
+
+def test_get_many(storage):
+    documents = asyncio.run(storage.get_many("data", ["hotel_data:hotel_id=2", "hotel_data:hotel_id=1",
+                                                      "hotel_data:hotel_id=3", "hotel_data:hotel_id=1"]))
+    assert documents == {document["cache_key"]: document for document in DOCUMENTS}
+
+
+def test_get_created_at(storage):
+    created_at = asyncio.run(storage.get_created_at("data", ["hotel_data:hotel_id=1", "hotel_data:hotel_id=3"]))
+    assert created_at == {"hotel_data:hotel_id=1": DOCUMENTS[0]["created_at"]}
+
+
+def test_put_many_replaces_by_cache_key(storage):
+    updated = {**DOCUMENTS[0], "data": {"name": "Updated"}}
+    asyncio.run(storage.put_many("data", [updated, {"hotel_id": 9, "data": {}}]))
+    assert asyncio.run(storage.get("data", "hotel_data:hotel_id=1")) == updated
+    assert len(asyncio.run(collect(storage.find("data")))) == 2
+
+
+def test_find(storage):
+    assert sorted(document["hotel_id"] for document in asyncio.run(collect(storage.find("data")))) == [1, 2]
+    assert asyncio.run(collect(storage.find("data", {"hotel_id": 2}))) == [DOCUMENTS[1]]
+    assert asyncio.run(collect(storage.find("data", {"hotel_id": 3}))) == []
+
+
+def test_delete_many_and_clear(storage):
+    asyncio.run(storage.delete_many("data", ["hotel_data:hotel_id=1", "hotel_data:hotel_id=3"]))
+    assert asyncio.run(storage.get_many("data", [document["cache_key"] for document in DOCUMENTS])) == \
+        {"hotel_data:hotel_id=2": DOCUMENTS[1]}
+    asyncio.run(storage.clear("data"))
+    assert asyncio.run(collect(storage.find("data"))) == []
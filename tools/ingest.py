@@ -0,0 +1,208 @@
+"""
+Resumable bulk ingestion for pre-warming the storage cache.
+
+Reads hotel ids from a file and loads every endpoint and locale combination through get_data_or_cache,
+at the throughput the shared rate limiter allows. Progress is checkpointed to the storage backend, so running
+the same command again after a crash resumes where it stopped.
+
+Usage:
+    python -m tools.ingest hotel_ids.txt --endpoints data,photos,room-list --locales it,en-gb,es,fr,de
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+
+from db.cache_keys import build_cache_key, normalize_params
+from db.cache_writer import CacheWriter
+from db.rapidapi_client import ensure_cache_indexes, env_expire_hours, get_data_or_cache
+from db.redis_client import AsyncRedisClient
+from db.storage import get_storage
+
+DEFAULT_ENDPOINTS = ["data", "photos", "room-list"]
+DEFAULT_LOCALES = ["it", "en-gb", "es", "fr", "de"]
+PROGRESS_COLLECTION = "ingest_progress"
+CHECKPOINT_BATCH_SIZE = 50  # Completed tasks written to storage at once
+REDIS_EXPIRE_SECONDS = 5
+
+
+def read_hotel_ids(path):
+    """
+    Read hotel ids from a file, one per line or comma separated. Blank lines and '#' comments are ignored.
+    """
+    hotel_ids = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.split("#", 1)[0]
+            hotel_ids.extend(int(value) for value in line.replace(",", " ").split())
+    return list(dict.fromkeys(hotel_ids))
+
+
+def build_tasks(hotel_ids, endpoints, locales, checkin_date, checkout_date, adults_number_by_rooms):
+    """
+    Build the (endpoint, params, cache_key) task of every hotel, endpoint and locale combination.
+    """
+    tasks = []
+    for hotel_id in hotel_ids:
+        for endpoint in endpoints:
+            for locale in locales:
+                params = {'hotel_id': hotel_id, 'locale': locale}
+                if endpoint == "room-list":
+                    params.update({
+                        'checkin_date': checkin_date,
+                        'checkout_date': checkout_date,
+                        'adults_number_by_rooms': adults_number_by_rooms,
+                        'units': "metric",
+                        'currency': "EUR",
+                    })
+                params = normalize_params(endpoint, params)
+                tasks.append((endpoint, params, build_cache_key(endpoint, params)))
+    return tasks
+
+
+class IngestRun:
+    """
+    Runs the ingestion tasks with a pool of workers and checkpoints completed tasks to storage.
+    """
+
+    def __init__(self, run_id, tasks, redis, concurrency, expire_hours, report_interval):
+        self.run_id = run_id
+        self.tasks = tasks
+        self.redis = redis
+        self.concurrency = concurrency
+        self.expire_hours = expire_hours
+        self.report_interval = report_interval
+        self.storage = get_storage()
+        self.checkpoints = []
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.start_time = 0.0
+
+    async def load_completed(self):
+        completed = set()
+        async for entry in self.storage.find(PROGRESS_COLLECTION, {"run_id": self.run_id, "status": "done"}):
+            completed.add(entry["task_key"])
+        return completed
+
+    async def checkpoint(self, force=False):
+        if not self.checkpoints or (len(self.checkpoints) < CHECKPOINT_BATCH_SIZE and not force):
+            return
+        checkpoints, self.checkpoints = self.checkpoints, []
+        await self.storage.put_many(PROGRESS_COLLECTION, checkpoints)
+
+    def record(self, endpoint, cache_key, status, error=None):
+        task_key = f"{endpoint}:{cache_key}"
+        self.checkpoints.append({
+            "cache_key": f"{self.run_id}:{task_key}",
+            "run_id": self.run_id,
+            "task_key": task_key,
+            "endpoint": endpoint,
+            "status": status,
+            "error": error,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    def report(self, total):
+        elapsed = time.perf_counter() - self.start_time
+        processed = self.done + self.failed
+        rate = processed / elapsed if elapsed else 0.0
+        remaining = total - processed
+        eta = timedelta(seconds=int(remaining / rate)) if rate else "unknown"
+        print(f"[{self.run_id}] {processed}/{total} tasks ({self.failed} failed, {self.skipped} resumed), "
+              f"{rate:.2f} tasks/s, ETA {eta}")
+
+    async def worker(self, queue):
+        while True:
+            endpoint, params, cache_key = await queue.get()
+            try:
+                await get_data_or_cache(endpoint, params, REDIS_EXPIRE_SECONDS, self.redis, self.expire_hours)
+                self.done += 1
+                self.record(endpoint, cache_key, "done")
+            except Exception as e:
+                self.failed += 1
+                self.record(endpoint, cache_key, "failed", str(getattr(e, "detail", e)))
+            finally:
+                await self.checkpoint()
+                queue.task_done()
+
+    async def reporter(self, total):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report(total)
+
+    async def run(self):
+        await self.storage.ensure_indexes([PROGRESS_COLLECTION])
+        completed = await self.load_completed()
+
+        queue = asyncio.Queue()
+        for endpoint, params, cache_key in self.tasks:
+            if f"{endpoint}:{cache_key}" in completed:
+                self.skipped += 1
+            else:
+                queue.put_nowait((endpoint, params, cache_key))
+
+        total = queue.qsize()
+        print(f"[{self.run_id}] {len(self.tasks)} tasks, {self.skipped} already done, {total} to run "
+              f"with {self.concurrency} workers")
+
+        self.start_time = time.perf_counter()
+        workers = [asyncio.create_task(self.worker(queue)) for _ in range(self.concurrency)]
+        reporter = asyncio.create_task(self.reporter(total))
+        try:
+            await queue.join()
+        finally:
+            for task in workers + [reporter]:
+                task.cancel()
+            await asyncio.gather(*workers, reporter, return_exceptions=True)
+            await self.checkpoint(force=True)
+            self.report(total)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pre-warm the storage cache for a list of hotel ids.")
+    parser.add_argument("hotel_ids_file", help="File with hotel ids, one per line or comma separated.")
+    parser.add_argument("--endpoints", default=",".join(DEFAULT_ENDPOINTS),
+                        help="Comma separated endpoints to load. Default: data,photos,room-list.")
+    parser.add_argument("--locales", default=",".join(DEFAULT_LOCALES),
+                        help="Comma separated locales to load. Default: it,en-gb,es,fr,de.")
+    parser.add_argument("--checkin-date", default=(datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d'),
+                        help="Room list check-in date. Default: 30 days from today.")
+    parser.add_argument("--checkout-date", default=(datetime.now() + timedelta(days=31)).strftime('%Y-%m-%d'),
+                        help="Room list check-out date. Default: 31 days from today.")
+    parser.add_argument("--adults-number-by-rooms", default="2,1", help="Room list adults per room. Default: 2,1.")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Concurrent tasks. The shared rate limiter caps the actual API throughput.")
+    parser.add_argument("--expire-hours", type=int, default=env_expire_hours,
+                        help="Documents younger than this are not fetched again.")
+    parser.add_argument("--run-id", default=None,
+                        help="Checkpoint id. Defaults to a hash of the ids and options, so reruns resume.")
+    parser.add_argument("--report-interval", type=float, default=10, help="Seconds between progress reports.")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    endpoints = [endpoint for endpoint in args.endpoints.split(",") if endpoint]
+    locales = [locale for locale in args.locales.split(",") if locale]
+    hotel_ids = read_hotel_ids(args.hotel_ids_file)
+    tasks = build_tasks(hotel_ids, endpoints, locales, args.checkin_date, args.checkout_date,
+                        args.adults_number_by_rooms)
+
+    run_id = args.run_id or hashlib.sha1(
+        "|".join(cache_key for _, _, cache_key in tasks).encode("utf-8")
+    ).hexdigest()[:12]
+
+    redis = await AsyncRedisClient.get_instance()
+    await ensure_cache_indexes()
+    try:
+        await IngestRun(run_id, tasks, redis, args.concurrency, args.expire_hours, args.report_interval).run()
+    finally:
+        await CacheWriter.get_instance().close()
+        await redis.close()
+        await get_storage().close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+Check of the shared Redis state against the configured Redis deployment (REDIS_MODE standalone, sentinel or
+cluster), run before rolling out a new Redis setup.
+
+Runs the upstream failure path against an unreachable URL: every failed call must surface as UpstreamError,
+count towards the circuit breaker and finally open the circuit. Only keys of the 'redis-check' endpoint are
+touched, and they are deleted afterwards.
+
+Usage:
+    REDIS_MODE=cluster REDIS_URL=redis://node-1:6379 python -m tools.redis_check
+"""
+import argparse
+import asyncio
+import sys
+
+from db.redis_client import AsyncRedisClient
+from db.upstream import CIRCUIT_FAILURE_THRESHOLD, UpstreamError, is_circuit_open, request_with_retries
+
+CHECK_ENDPOINT = "redis-check"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the circuit breaker against the configured Redis.")
+    parser.add_argument("--url", default="http://127.0.0.1:9/", help="Unreachable URL the failing calls go to.")
+    return parser.parse_args()
+
+
+async def no_slot():
+    pass
+
+
+async def check_failure_path(redis, url):
+    """
+    Fail upstream calls until the circuit opens. Returns the number of failed calls.
+    """
+    failures_key = f"circuit_failures_{CHECK_ENDPOINT}"
+    calls = 0
+    while not await is_circuit_open(redis, CHECK_ENDPOINT):
+        if calls > CIRCUIT_FAILURE_THRESHOLD:
+            raise AssertionError(f"Circuit still closed after {calls} failed calls")
+        try:
+            await request_with_retries(url, {}, {}, redis, CHECK_ENDPOINT, no_slot)
+        except UpstreamError as e:
+            print(f"Call {calls + 1} failed with UpstreamError {e.status_code}, "
+                  f"failures={await redis.get(failures_key)} ttl={await redis.ttl(failures_key)}")
+        calls += 1
+
+    try:
+        await request_with_retries(url, {}, {}, redis, CHECK_ENDPOINT, no_slot)
+    except UpstreamError as e:
+        if e.status_code != 503:
+            raise AssertionError(f"Expected the open circuit to answer 503, got {e.status_code}")
+        return calls
+    raise AssertionError("The open circuit let a call through")
+
+
+async def main():
+    args = parse_args()
+    redis = await AsyncRedisClient.get_instance()
+    try:
+        calls = await check_failure_path(redis, args.url)
+        print(f"OK: circuit opened after {calls} failed calls and rejects further calls")
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
+    finally:
+        await redis.delete(f"circuit_failures_{CHECK_ENDPOINT}")
+        await redis.delete(f"circuit_open_{CHECK_ENDPOINT}")
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+"""
+Snapshot export and import of the storage cache collections, for seeding new environments.
+
+A snapshot is a directory with a manifest.json and gzip compressed JSON-lines chunks per collection.
+
+Usage:
+    python -m tools.snapshot export snapshots/2024-09-25
+    python -m tools.snapshot import snapshots/2024-09-25 --drop --redis
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from db.cache_payload import encode_payload
+from db.rapidapi_client import CACHE_COLLECTIONS, ensure_cache_indexes
+from db.redis_client import AsyncRedisClient
+from db.storage import get_storage
+
+MANIFEST_FILE = "manifest.json"
+DEFAULT_CHUNK_SIZE = 10000  # Documents per chunk file
+DEFAULT_BATCH_SIZE = 1000  # Documents per bulk insert
+DEFAULT_REDIS_EXPIRE_SECONDS = 3600
+
+
+def chunk_path(directory, collection, index):
+    return os.path.join(directory, f"{collection}-{index:05d}.jsonl.gz")
+
+
+async def export_snapshot(directory, collections, chunk_size):
+    """
+    Stream every document of the collections into compressed chunk files and write the manifest.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"created_at": datetime.now(timezone.utc).isoformat(), "collections": {}}
+
+    for collection in collections:
+        start_time = time.perf_counter()
+        files = []
+        count = 0
+        output = None
+        try:
+            async for document in get_storage().find(collection):
+                if count % chunk_size == 0:
+                    if output:
+                        output.close()
+                    path = chunk_path(directory, collection, len(files))
+                    output = gzip.open(path, "wt", encoding="utf-8")
+                    files.append(os.path.basename(path))
+                output.write(json.dumps(document, ensure_ascii=False, default=str))
+                output.write("\n")
+                count += 1
+        finally:
+            if output:
+                output.close()
+
+        manifest["collections"][collection] = {"documents": count, "files": files}
+        print(f"Exported {count} documents from '{collection}' in {len(files)} chunks "
+              f"({time.perf_counter() - start_time:.1f}s)")
+
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+
+async def import_snapshot(directory, collections, batch_size, drop, redis=None, redis_expire_seconds=None):
+    """
+    Bulk insert the snapshot chunks into storage and optionally pre-populate Redis with the same entries.
+    Without drop, documents replace the existing ones with the same cache key.
+    """
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    for collection in collections:
+        entry = manifest["collections"].get(collection)
+        if not entry:
+            print(f"Collection '{collection}' is not in the snapshot, skipping")
+            continue
+
+        if drop:
+            await get_storage().clear(collection)
+
+        start_time = time.perf_counter()
+        count = 0
+        for file_name in entry["files"]:
+            with gzip.open(os.path.join(directory, file_name), "rt", encoding="utf-8") as chunk:
+                batch = []
+                for line in chunk:
+                    batch.append(json.loads(line))
+                    if len(batch) >= batch_size:
+                        count += await insert_batch(collection, batch, not drop, redis, redis_expire_seconds)
+                        batch = []
+                if batch:
+                    count += await insert_batch(collection, batch, not drop, redis, redis_expire_seconds)
+
+        print(f"Imported {count} documents into '{collection}' ({time.perf_counter() - start_time:.1f}s)")
+
+
+async def insert_batch(collection, documents, replace, redis, redis_expire_seconds):
+    """
+    Insert a batch of documents, or upsert them on their cache key when the collection was not emptied.
+    """
+    if redis is not None:
+        async with redis.pipeline(transaction=False) as pipe:
+            for document in documents:
+                if document.get("cache_key"):
+                    pipe.set(document["cache_key"], encode_payload(json.dumps(document.get("data")).encode()),
+                             ex=redis_expire_seconds)
+            await pipe.execute()
+
+    # MongoDB's insert_many adds an _id to each document, so Redis is written first from the untouched copies
+    await get_storage().put_many(collection, documents, replace=replace)
+    return len(documents)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export or import a snapshot of the storage cache collections.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export the collections to a snapshot directory.")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Documents per chunk file.")
+
+    import_parser = subparsers.add_parser("import", help="Import a snapshot directory into the collections.")
+    import_parser.add_argument("directory")
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Documents per insert.")
+    import_parser.add_argument("--drop", action="store_true",
+                               help="Empty each collection and bulk insert. Without it documents are upserted.")
+    import_parser.add_argument("--redis", action="store_true",
+                               help="Also pre-populate Redis. Set REDIS_FLUSH_ON_STARTUP=false to keep the entries.")
+    import_parser.add_argument("--redis-expire-seconds", type=int, default=DEFAULT_REDIS_EXPIRE_SECONDS)
+
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument("--collections", default=",".join(CACHE_COLLECTIONS),
+                               help="Comma separated collections. Default: data,photos,reviews,room-list.")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    collections = [collection for collection in args.collections.split(",") if collection]
+
+    if args.command == "export":
+        try:
+            await export_snapshot(args.directory, collections, args.chunk_size)
+        finally:
+            await get_storage().close()
+        return
+
+    redis = await AsyncRedisClient.get_instance() if args.redis else None
+    try:
+        await import_snapshot(args.directory, collections, args.batch_size, args.drop, redis,
+                              args.redis_expire_seconds)
+        await ensure_cache_indexes()
+    finally:
+        if redis is not None:
+            await redis.close()
+        await get_storage().close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())